@@ -4,15 +4,35 @@ author: open-webui
 author_url: https://github.com/open-webui
 funding_url: https://github.com/open-webui
 version: 1.0.2
+requirements: aiohttp, orjson, msgpack
 """
 
 from typing import Callable, Any
-import requests
-import json
+import aiohttp
+import msgpack
+import orjson
 import asyncio
+import functools
 import shlex
 
 
+# Modelo da resposta formatada devolvida ao LLM
+_TEMPLATE = (
+    "🖥️ **Comando executado:** `{cmd}`\n"
+    "🌍 **Ambiente:** {env}\n"
+    "📊 **Return Code:** {rc}"
+    "{stdout_block}{stderr_block}"
+)
+
+
+@functools.lru_cache(maxsize=256)
+def _split_cached(command: str) -> tuple[str, ...]:
+    """
+    shlex.split memoizado (o LLM costuma repetir o mesmo comando composto).
+    """
+    return tuple(shlex.split(command))
+
+
 class Tools:
     """
     Ferramenta para execução de comandos no terminal via API local.
@@ -22,6 +42,38 @@ class Tools:
     def __init__(self):
         self.valves = self.Valves()
 
+        # Sessão HTTP assíncrona (keep-alive com a API). Criada no primeiro
+        # uso, pois o ClientSession precisa de um event loop em execução.
+        self._aio_session = None
+        self._aio_uds = None
+        # Pede msgpack: stdout volumoso trafega sem escapes de string JSON
+        self._headers = {
+            "Content-Type": "application/json",
+            "Accept": "application/msgpack",
+        }
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        """
+        Retorna a sessão aiohttp compartilhada, criando-a se necessário.
+
+        Se a valve API_UDS_PATH estiver definida, conecta via Unix domain socket
+        (recriando a sessão caso o caminho mude).
+        """
+        uds = self.valves.API_UDS_PATH
+        if (
+            self._aio_session is None
+            or self._aio_session.closed
+            or self._aio_uds != uds
+        ):
+            if uds:
+                connector = aiohttp.UnixConnector(
+                    path=uds, limit=32, keepalive_timeout=60)
+            else:
+                connector = aiohttp.TCPConnector(limit=32, keepalive_timeout=60)
+            self._aio_session = aiohttp.ClientSession(connector=connector)
+            self._aio_uds = uds
+        return self._aio_session
+
     class Valves:
         """
         Configurações da ferramenta (editáveis via interface do Open-WebUI).
@@ -30,6 +82,9 @@ class Tools:
         def __init__(self):
             # self.API_BASE_URL: str = "http://localhost:8000"
             self.API_BASE_URL: str = "http://host.docker.internal:8000"
+            # Socket Unix compartilhado com a API (ex: "/var/run/terminal/terminal.sock").
+            # Quando definido, API_BASE_URL serve apenas para montar a URL.
+            self.API_UDS_PATH: str = ""
             self.TIMEOUT: int = 300
             self.MAX_OUTPUT_LENGTH: int = 4000
 
@@ -62,9 +117,9 @@ class Tools:
 
         # 🔧 FIX: Se o binary contém espaços, parsear como comando completo
         if " " in binary:
-            parsed = shlex.split(binary)
+            parsed = _split_cached(binary)
             binary = parsed[0]
-            args = parsed[1:] + args
+            args = list(parsed[1:]) + args
 
         # Emite evento de status inicial
         if __event_emitter__:
@@ -87,16 +142,19 @@ class Tools:
             }
 
             # Realiza a chamada à API
-            response = requests.post(
+            async with self._get_session().post(
                 f"{self.valves.API_BASE_URL}/run",
                 json=payload,
-                headers={"Content-Type": "application/json"},
-                timeout=timeout + 5
-            )
-
-            # Valida resposta
-            response.raise_for_status()
-            result = response.json()
+                headers=self._headers,
+                timeout=aiohttp.ClientTimeout(total=timeout + 5)
+            ) as response:
+                # Valida resposta
+                response.raise_for_status()
+                body = await response.read()
+                if response.content_type == "application/msgpack":
+                    result = msgpack.unpackb(body, raw=False)
+                else:
+                    result = orjson.loads(body)
 
             # Formata o output
             command_executed = result.get(
@@ -115,19 +173,17 @@ class Tools:
                     "\n... (truncado)"
 
             # Monta resposta formatada
-            output_parts = [
-                f"🖥️ **Comando executado:** `{command_executed}`",
-                f"🌍 **Ambiente:** {environment}",
-                f"📊 **Return Code:** {returncode}",
-            ]
-
-            if stdout:
-                output_parts.append(f"\n**📤 STDOUT:**\n```\n{stdout}\n```")
-
-            if stderr:
-                output_parts.append(f"\n**⚠️ STDERR:**\n```\n{stderr}\n```")
-
-            result_message = "\n".join(output_parts)
+            result_message = _TEMPLATE.format(
+                cmd=command_executed,
+                env=environment,
+                rc=returncode,
+                stdout_block=(
+                    f"\n\n**📤 STDOUT:**\n```\n{stdout}\n```" if stdout else ""
+                ),
+                stderr_block=(
+                    f"\n\n**⚠️ STDERR:**\n```\n{stderr}\n```" if stderr else ""
+                )
+            )
 
             # Emite evento de conclusão
             if __event_emitter__:
@@ -143,7 +199,7 @@ class Tools:
 
             return result_message
 
-        except requests.exceptions.Timeout:
+        except asyncio.TimeoutError:
             error_msg = f"⏱️ **Erro:** Timeout ao executar comando '{binary}'"
             if __event_emitter__:
                 await __event_emitter__(
@@ -157,7 +213,7 @@ class Tools:
                 )
             return error_msg
 
-        except requests.exceptions.RequestException as e:
+        except aiohttp.ClientError as e:
             error_msg = f"🚨 **Erro de comunicação com a API:** {str(e)}"
             if __event_emitter__:
                 await __event_emitter__(
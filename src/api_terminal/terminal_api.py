@@ -1,17 +1,29 @@
-from fastapi import FastAPI, HTTPException, Header
-from pydantic import BaseModel
+from fastapi import FastAPI, HTTPException, Header, Response
+from pydantic import BaseModel, ConfigDict
+import asyncio
+import concurrent.futures
 import subprocess
+import functools
+import logging
+import re
 import shlex
 import os
+import msgpack
+import orjson
 import uvicorn
+from cachetools import TTLCache
 from dotenv import load_dotenv
 
 
 # 🔧 Carrega variáveis do .env (se existir)
 load_dotenv()
 
+logging.basicConfig(level=logging.INFO)
+log = logging.getLogger("terminal_api")
+
 # 🔧 Ambiente: dev (default) ou prod
 ENVIRONMENT = os.getenv("APP_ENV", "dev")
+_PROD = ENVIRONMENT == "prod"
 
 # 🔐 API key obrigatória (sem default inseguro)
 API_KEY = os.getenv("TERMINAL_API_KEY")
@@ -23,23 +35,41 @@ if API_KEY is None:
 
 PORT = int(os.getenv("TERMINAL_PORT", "8000"))
 HOST = os.getenv("TERMINAL_HOST", "0.0.0.0")
+# Socket Unix opcional (ex: /var/run/terminal/terminal.sock); substitui HOST/PORT
+UDS = os.getenv("TERMINAL_UDS")
+# Workers do uvicorn (cada um com seu próprio cache e pool de spawn)
+WORKERS = int(os.getenv("TERMINAL_WORKERS", str(min(os.cpu_count() or 1, 4))))
 # 🔐 Senha sudo (opcional, apenas para ambiente local controlado)
 SUDO_PASSWORD = os.getenv("SUDO_PASSWORD")
+# Limite de bytes lidos de stdout/stderr; acima disso o processo é encerrado
+MAX_OUTPUT_BYTES = int(os.getenv("TERMINAL_MAX_OUTPUT_BYTES", "65536"))
+TRUNCATION_MARKER = "\n... (truncado)"
 
 # Lista de binários permitidos (apenas para ambiente dev)
-ALLOWED_BINARIES = [
+ALLOWED_BINARIES = frozenset({
     "ls", "pwd", "whoami", "id", "cat", "grep", "find",
     "docker",  # mantenha só se quiser permitir comandos docker
     "python3", "python"
-]
+})
+
+# Binários cujo resultado não depende do sistema de arquivos: pode ser
+# reaproveitado por alguns segundos (ls veria arquivos criados nesse intervalo)
+_IDEMPOTENT = frozenset({"whoami", "id"})
+_RESULT_CACHE = TTLCache(maxsize=1024, ttl=2.0)
+# Execuções em andamento desses mesmos comandos (chave + timeout), para
+# coalescer duplicatas
+_inflight: dict[tuple, asyncio.Task] = {}
 
 
 class CommandRequest(BaseModel):
+    model_config = ConfigDict(extra="ignore", frozen=True)
+
     binary: str          # ex: "ls"
-    args: list[str] = []  # ex: ["-la", "/"]
+    args: tuple[str, ...] = ()  # ex: ["-la", "/"]
     timeout: int = 300  # timeout padrão de 5 minutos
 
 
+# Usado apenas na documentação OpenAPI: a resposta é serializada direto com orjson
 class CommandResponse(BaseModel):
     command: str
     stdout: str
@@ -48,52 +78,206 @@ class CommandResponse(BaseModel):
     environment: str     # dev ou prod
 
 
+@functools.lru_cache(maxsize=128)
 def is_binary_allowed(binary: str) -> bool:
     """
     Em dev: checa se o binário está na whitelist.
     Em prod: sempre permite.
     """
-    if ENVIRONMENT == "prod":
-        # 🚨 Sem restrição de binário em prod (por sua conta e risco)
-        return True
-    return binary in ALLOWED_BINARIES
+    # 🚨 Sem restrição de binário em prod (por sua conta e risco)
+    return True if _PROD else binary in ALLOWED_BINARIES
+
+
+# Pool dedicado ao fork/exec: o Popen faz uma leitura bloqueante no pipe de
+# erro do exec logo após o fork, então o spawn não pode rodar no event loop.
+_SPAWN_POOL = concurrent.futures.ThreadPoolExecutor(max_workers=8)
+
+# O spawn evita preexec_fn, pass_fds, start_new_session, user/group etc. para
+# que, no Linux, o CPython use o caminho vfork() (CLONE_VM) do _posixsubprocess
+# e não copie as tabelas de página deste processo a cada comando. close_fds=True
+# é compatível com esse caminho (apenas o posix_spawn o descarta).
+if not getattr(subprocess, "_USE_VFORK", False):
+    log.warning("subprocess sem suporte a vfork: spawn usará fork() completo")
+
+
+def _spawn(cmd_list: list[str], stdin_data: bytes | None) -> subprocess.Popen:
+    """
+    Cria o processo (executado no _SPAWN_POOL) e entrega o stdin, se houver.
+    """
+    proc = subprocess.Popen(
+        cmd_list,
+        stdin=subprocess.PIPE if stdin_data else None,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        close_fds=True
+    )
+    if stdin_data:
+        try:
+            proc.stdin.write(stdin_data)
+        except BrokenPipeError:
+            pass  # processo encerrou antes de ler o stdin
+        finally:
+            proc.stdin.close()
+    return proc
+
+
+# Argumentos que o shlex.quote devolveria sem alteração
+_SAFE_ARG = re.compile(r"\A[A-Za-z0-9_@%+=:,./-]+\Z").match
+
+
+def _quote(part: str) -> str:
+    """
+    shlex.quote com atalho para o caso comum de argumento que dispensa aspas.
+    """
+    return part if _SAFE_ARG(part) else shlex.quote(part)
+
+
+async def _pipe_reader(loop, pipe):
+    """
+    Conecta um pipe do processo ao event loop e retorna (reader, transport).
+    """
+    reader = asyncio.StreamReader()
+    transport, _ = await loop.connect_read_pipe(
+        lambda: asyncio.StreamReaderProtocol(reader), pipe
+    )
+    return reader, transport
+
+
+async def _drain(reader, proc: subprocess.Popen, cap: int) -> tuple[bytes, bool]:
+    """
+    Lê o stream até EOF ou até passar de ``cap`` bytes, quando encerra o
+    processo. Retorna (dados, truncado).
+    """
+    buf = bytearray()
+    while len(buf) <= cap:
+        chunk = await reader.read(8192)
+        if not chunk:
+            return bytes(buf), False
+        buf += chunk
+    proc.terminate()
+    return bytes(buf[:cap]), True
+
+
+async def _communicate(proc: subprocess.Popen) -> tuple[str, str]:
+    """
+    Drena stdout/stderr de forma assíncrona (limitado a MAX_OUTPUT_BYTES por
+    stream) e aguarda o fim do processo.
+    """
+    loop = asyncio.get_running_loop()
+    out_reader, out_transport = await _pipe_reader(loop, proc.stdout)
+    err_reader, err_transport = await _pipe_reader(loop, proc.stderr)
+    try:
+        (out, out_cut), (err, err_cut) = await asyncio.gather(
+            _drain(out_reader, proc, MAX_OUTPUT_BYTES),
+            _drain(err_reader, proc, MAX_OUTPUT_BYTES)
+        )
+        await loop.run_in_executor(_SPAWN_POOL, proc.wait)
+    finally:
+        out_transport.close()
+        err_transport.close()
+
+    stdout = out.decode(errors="replace")
+    stderr = err.decode(errors="replace")
+    if out_cut:
+        stdout += TRUNCATION_MARKER
+    if err_cut:
+        stderr += TRUNCATION_MARKER
+    return stdout, stderr
 
 
 app = FastAPI(title=f"Terminal API ({ENVIRONMENT})")
 
 
-@app.post("/run", response_model=CommandResponse)
-def run_command(
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+
+
+def _encode_response(result: dict, accept: str | None) -> Response:
+    """
+    Serializa o resultado sem passar pela validação do Pydantic: msgpack se o
+    cliente pedir (Accept: application/msgpack), senão JSON via orjson.
+    """
+    if accept == MSGPACK_MEDIA_TYPE:
+        return Response(
+            content=msgpack.packb(result, use_bin_type=True),
+            media_type=MSGPACK_MEDIA_TYPE
+        )
+    return Response(content=orjson.dumps(result), media_type="application/json")
+
+
+@app.post("/run", responses={200: {"model": CommandResponse}})
+async def run_command(
     req: CommandRequest,
-    x_api_key: str = Header(None, alias="X-API-Key")
+    x_api_key: str = Header(None, alias="X-API-Key"),
+    accept: str = Header(None)
 ):
     # 🔐 Autenticação via API key
     # if x_api_key != API_KEY:
     #     raise HTTPException(
     #         status_code=401, detail="API key inválida ou ausente.")
 
-    import logging
-    logging.basicConfig(level=logging.INFO)
-
     # 🔍 LOG: Comando recebido
-    print(f"📥 Comando recebido: binary={req.binary}, args={req.args}")
+    log.debug("📥 Comando recebido: binary=%s, args=%s", req.binary, req.args)
 
     # ✅ Política de comandos
-    allowed = is_binary_allowed(req.binary)
-    # print(f"🔐 Comando permitido? {allowed}")
-
-    if not allowed:
-        print(f"🚫 Comando BLOQUEADO: {req.binary}")
+    if not is_binary_allowed(req.binary):
+        log.debug("🚫 Comando BLOQUEADO: %s", req.binary)
         raise HTTPException(
             status_code=400,
             detail="Comando não permitido pela política de segurança (ambiente dev)."
         )
 
+    # ♻️ Reaproveita o resultado de comandos idempotentes recentes. Todo acesso
+    # ao cache acontece no event loop, então não há necessidade de lock.
+    key = _cache_key(req)
+    if key is None:
+        return _encode_response(await _execute(req), accept)
+
+    cached = _RESULT_CACHE.get(key)
+    if cached is not None:
+        return _encode_response(cached, accept)
+
+    # 🔗 Comando idêntico (e com o mesmo timeout) já em execução: aguarda o
+    # mesmo resultado. A execução é uma task própria, então a desconexão de um
+    # cliente não cancela o comando para os demais.
+    inflight_key = (*key, req.timeout)
+    task = _inflight.get(inflight_key)
+    if task is None:
+        task = asyncio.create_task(_execute(req))
+        _inflight[inflight_key] = task
+        task.add_done_callback(
+            functools.partial(_finish_inflight, key, inflight_key))
+    return _encode_response(await asyncio.shield(task), accept)
+
+
+def _finish_inflight(key: tuple, inflight_key: tuple, task: asyncio.Task):
+    """
+    Tira a execução de _inflight e guarda o resultado em cache se deu certo.
+    """
+    _inflight.pop(inflight_key, None)
+    # exception() também marca o erro como consumido caso ninguém aguarde
+    if not task.cancelled() and task.exception() is None:
+        _RESULT_CACHE[key] = task.result()
+
+
+def _cache_key(req: CommandRequest) -> tuple | None:
+    """
+    Retorna a chave de cache do comando, ou None se ele não puder ser cacheado.
+    """
+    if req.binary in _IDEMPOTENT:
+        return (req.binary, req.args)
+    return None
+
+
+async def _execute(req: CommandRequest) -> dict:
+    """
+    Executa o comando e monta o resultado no formato de CommandResponse.
+    """
     # Monta a lista final
-    cmd_list = [req.binary] + (req.args or [])
+    cmd_list = [req.binary, *req.args]
     # print(f"🔧 Comando completo: {cmd_list}")
 
     try:
+        stdin_data = None
         if req.binary == "sudo":
             # Verifica se a senha está configurada
             if SUDO_PASSWORD is None:
@@ -103,51 +287,47 @@ def run_command(
                 )
 
             # Monta comando: sudo -S + args completos
-            cmd_list = ["sudo", "-S"] + req.args
-
-            result = subprocess.run(
-                cmd_list,
-                shell=False,
-                capture_output=True,
-                text=True,
-                input=f"{SUDO_PASSWORD}\n",  # Senha via stdin
-                timeout=req.timeout
-            )
-        else:
-            # Comando normal (não-sudo)
-            cmd_list = [req.binary] + req.args
-
-            result = subprocess.run(
-                cmd_list,
-                shell=False,
-                capture_output=True,
-                text=True,
+            cmd_list = ["sudo", "-S", *req.args]
+            stdin_data = f"{SUDO_PASSWORD}\n".encode()  # Senha via stdin
+
+        loop = asyncio.get_running_loop()
+        proc = await loop.run_in_executor(
+            _SPAWN_POOL, _spawn, cmd_list, stdin_data
+        )
+
+        try:
+            stdout, stderr = await asyncio.wait_for(
+                _communicate(proc),
                 timeout=req.timeout
             )
+        except asyncio.TimeoutError:
+            proc.kill()
+            await loop.run_in_executor(_SPAWN_POOL, proc.wait)
+            raise
+
+        returncode = proc.returncode
 
-        # print(f"✅ Executado! Return code: {result.returncode}")
-        print(f"📤 STDOUT (primeiros 200 chars): {result.stdout[:200]}")
-        print(f"📤 STDERR (primeiros 200 chars): {result.stderr[:200]}")
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug("📤 STDOUT (primeiros 200 chars): %s", stdout[:200])
+            log.debug("📤 STDERR (primeiros 200 chars): %s", stderr[:200])
 
-    except subprocess.TimeoutExpired as e:
-        print(f"⏱️ TIMEOUT: {e}")
+    except asyncio.TimeoutError:
+        log.debug("⏱️ TIMEOUT: %s", cmd_list)
         raise HTTPException(
             status_code=500, detail="Comando demorou demais e foi interrompido.")
     except Exception as e:
-        print(f"❌ ERRO INESPERADO: {type(e).__name__}: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        log.exception("❌ ERRO INESPERADO: %s: %s", type(e).__name__, e)
         raise HTTPException(status_code=500, detail=f"Erro: {str(e)}")
 
-    command_str = " ".join(shlex.quote(part) for part in cmd_list)
+    command_str = " ".join([_quote(part) for part in cmd_list])
 
-    return CommandResponse(
-        command=command_str,
-        stdout=result.stdout,
-        stderr=result.stderr,
-        returncode=result.returncode,
-        environment=ENVIRONMENT
-    )
+    return {
+        "command": command_str,
+        "stdout": stdout,
+        "stderr": stderr,
+        "returncode": returncode,
+        "environment": ENVIRONMENT
+    }
 
 
 if __name__ == "__main__":
@@ -156,7 +336,7 @@ if __name__ == "__main__":
 ║   🔒 Secure Terminal Server                             ║
 ╠══════════════════════════════════════════════════════════╣
 ║   Port: {PORT}                                              ║
-║   Host: {HOST}                                         ║
+║   Host: {UDS or HOST}                                         ║
 ║   API Key: {'✓ Configured' if API_KEY else '✗ Missing'}                                    ║
 ╚══════════════════════════════════════════════════════════╝
 
@@ -164,8 +344,13 @@ Server starting...
     """)
 
     uvicorn.run(
-        app,
+        "terminal_api:app",
         host=HOST,
         port=PORT,
-        log_level="info"
+        uds=UDS,
+        loop="uvloop",
+        http="httptools",
+        workers=WORKERS,
+        log_level="info",
+        access_log=False
     )
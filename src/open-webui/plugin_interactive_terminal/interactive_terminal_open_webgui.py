@@ -4,92 +4,634 @@ author: Alexander Otto
 version: 5.0
 description: Secure interactive terminal for Agnet-Human co-pilot.
 required_open_webui_version: 0.3.9
+requirements: aiohttp, orjson
 
 *Requires seperate script to be running on local system to connect to terminal*
 """
 
-import uuid
-import requests
+import asyncio
+import bisect
+import functools
+import importlib
+from dataclasses import dataclass
 from typing import Callable, Any
-from datetime import datetime
 import time
 import os
 
+try:
+    import orjson
+
+    _loads = orjson.loads
+    _dumps = orjson.dumps
+except ImportError:  # stdlib fallback, same bytes-in/bytes-out contract
+    import json
+
+    _loads = json.loads
+
+    def _dumps(obj):
+        return json.dumps(obj).encode()
+
+
+@functools.cache
+def _import(name):
+    """
+    Import a module on first use.
+
+    OpenWebUI imports every installed tool at startup; keeping aiohttp and uuid
+    out of module import makes that enumeration cheap for a
+    tool that is never called.
+    """
+    return importlib.import_module(name)
+
+
+# Job status messages, shared by check_job and the job wait. %-style so they
+# are parsed once here instead of on every poll.
+_JOB_COMPLETED_TMPL = """
+✅ **%(kind)s Completed**
+
+**Command:** `%(command)s`
+**Duration:** %(elapsed).1f seconds
+
+**Output:**
+%(output)s
+
+**💻 [Terminal](%(terminal_url)s)**
+"""
+
+_JOB_RUNNING_TMPL = """
+⚙️ **%(kind)s Running**
+
+**Command:** `%(command)s`
+**Elapsed:** %(elapsed).0f seconds
+**Estimated remaining:** ~%(remaining).0f seconds
+
+**💻 [Watch live](%(terminal_url)s)**
+"""
+
+_JOB_FAILED_TMPL = """
+❌ **%(kind)s Failed**
+
+**Command:** `%(command)s`
+**Error:** %(error)s
+
+**💻 [Terminal](%(terminal_url)s)**
+"""
+
+_JOB_QUEUED_TMPL = """
+⏳ **%(kind)s Queued**
+
+**Command:** `%(command)s`
+
+The job is waiting to execute.
+
+**💻 [Terminal](%(terminal_url)s)**
+"""
+
+_JOB_TEMPLATES = {
+    "completed": _JOB_COMPLETED_TMPL,
+    "running": _JOB_RUNNING_TMPL,
+    "failed": _JOB_FAILED_TMPL,
+}
+
+_LAST_COMMAND_TMPL = """
+**📋 Last Command**
+
+**%(source_icon)s Source:** %(source_label)s
+**Time:** %(ts)s
+**Command:** `%(command)s`
+**Risk Level:** %(risk_level)s
+
+**Output:**
+%(output)s
+
+**💻 [Terminal](%(terminal_url)s)**
+"""
+
+# Tool-call messages, kept flush-left so no indentation leaks into the
+# Markdown (filled with str.format)
+_OPEN_TERMINAL_MSG = """
+🖥️ **Secure Terminal Session Created**
+
+**🌐 OPEN TERMINAL HERE:**
+{terminal_url}
+
+**Session ID:** `{session_id}`
+
+**🔒 Security Features Active:**
+- ✓ Command validation and risk assessment
+- ✓ Dangerous commands are blocked automatically
+- ✓ High/medium risk commands require your approval
+- ✓ All activity is logged
+
+I can now execute commands. You'll be prompted to approve any potentially risky operations.
+"""
+
+_BLOCKED_MSG = """
+🚫 **Command Blocked for Security**
+
+**Command:** `{command}`
+
+**Reason:** {reason}
+
+This command has been blocked to protect your system. It cannot be executed.
+
+**💻 [Terminal]({terminal_url})**
+"""
+
+_CONFIRMATION_MSG = """
+{risk_emoji} **User Confirmation Required**
+
+**Risk Level:** {risk_level}
+**Command:** `{command}`
+
+**Why confirmation is needed:**
+{risk_reason}
+
+**What's happening:**
+I've sent this command for your approval. Please check the terminal window to approve or deny it.
+
+**💻 [Open terminal to approve/deny]({terminal_url})**
+
+I'll check back to see if you've approved it...
+"""
+
+_START_MSG = """
+✅ **Command Started**
+
+**Command:** `{command}`
+**Risk Level:** {risk_level}
+**Job ID:** `{job_prefix}...`
+
+The command is now executing.
+
+**💻 [Watch live]({terminal_url})**
+"""
+
+_BATCH_START_MSG = """
+✅ **{count} Commands Started**
+
+{jobs}
+
+The commands now run one after another in the session's shell.
+
+**💻 [Watch live]({terminal_url})**
+"""
+
+_STILL_WAITING_MSG = """
+⏰ **Still Waiting for Confirmation**
+
+**Command:** `{command}`
+
+I've checked multiple times but you haven't approved or denied this command yet.
+
+**What to do:**
+1. **Open the terminal:** {terminal_url}
+2. **Click Approve or Deny** in the confirmation dialog
+3. **Tell me** "check if command was approved" and I'll continue
+
+**Confirmation ID:** `{confirmation_prefix}...`
+"""
+
+_STILL_RUNNING_MSG = """
+⏰ **Command Still Running**
+
+**Command:** `{command}`
+
+I've waited about {budget:.0f} seconds but the command is still executing.
+
+**What to do:**
+1. **Watch it live:** {terminal_url}
+2. **When done, tell me:** "check job {job_prefix}" or "show recent commands"
+
+I'll retrieve and analyze the results when you're ready!
+"""
+
+_TERMINAL_LINK_MSG = """
+**🖥️ Secure Terminal Link**
+
+{terminal_url}
+
+**Session ID:** `{session_id}`
+"""
+
+_RECENT_HEADER_MSG = """
+**📋 Recent Commands** (Last {shown} of {total} total)
+
+**💻 [Terminal]({terminal_url})**
+
+"""
+
+# How long a fetched command history is reused without asking the server
+_HIST_TTL = 2.0
+
+# Characters of job output kept locally, the end only (the server's
+# MAX_OUTPUT_CHARS default)
+_OUTPUT_MAX = 1024 * 1024
+
+# Every UI message shares this shape; _emit copies it instead of rebuilding
+# the literal at each call site
+_EMIT_SKELETON = {"type": "message", "data": None}
+
+_SOURCE_MAP = {
+    "llm": ("🤖", "Assistant"),
+    "llm_async": ("🔄", "Assistant (async)"),
+    "user": ("👤", "User"),
+}
+
+
+@dataclass(slots=True)
+class _JobRec:
+    """Local record of a job this tool started (value of ``Tools.active_jobs``)."""
+
+    command: str
+    session_id: str
+
+
+@dataclass(slots=True)
+class _ConfRec:
+    """Local record of a command awaiting approval (value of ``Tools.pending_confirmations``)."""
+
+    command: str
+    session_id: str
+    risk_level: str
+
+
+def _hhmmss(timestamp: str) -> str:
+    """
+    ``HH:MM:SS`` part of an ISO-8601 timestamp.
+
+    The server sends ``YYYY-MM-DDTHH:MM:SS[.ffffff]``, so this is a slice;
+    anything else goes through ``datetime.fromisoformat``.
+
+    :param timestamp: ISO-8601 timestamp string.
+    :type timestamp: str
+
+    :rtype: str
+    """
+    if len(timestamp) >= 19 and timestamp[10] == "T":
+        return timestamp[11:19]
+
+    from datetime import datetime
+
+    return datetime.fromisoformat(timestamp).strftime("%H:%M:%S")
+
+
+@functools.lru_cache(maxsize=1024)
+def _format_cmd(ts: str, icon: str, risk: str, command: str, output_head: str, truncated: bool) -> str:
+    """
+    Render one history entry for ``get_recent_commands`` (without its index).
+
+    History entries never change once written, so repeated listings of the
+    same session are served from the cache.
+
+    :param ts: ``HH:MM:SS`` of the command.
+    :type ts: str
+    :param icon: Source icon.
+    :type icon: str
+    :param risk: Risk level reported by the server.
+    :type risk: str
+    :param command: Command line.
+    :type command: str
+    :param output_head: First 200 characters of the stripped output.
+    :type output_head: str
+    :param truncated: Whether the output was longer than ``output_head``.
+    :type truncated: bool
+
+    :returns: Markdown block.
+    :rtype: str
+    """
+    if output_head:
+        body = f"**Output:**\n```\n{output_head}{'...' if truncated else ''}\n```\n"
+    else:
+        body = "*No output*\n"
+    return f"{icon}** {ts} - Risk: {risk}\n**Command:** `{command}`\n{body}\n"
+
+
+def _render_recent(i: int, cmd: dict) -> tuple:
+    """
+    Both renderings of one ``get_recent_commands`` entry, built in one pass.
+
+    :param i: 1-based position in the listing.
+    :type i: int
+    :param cmd: History entry as returned by the server.
+    :type cmd: dict
+
+    :returns: ``(markdown block for the UI, plain-text block for the LLM)``.
+    :rtype: tuple[str, str]
+    """
+    output = cmd.get("output", "").strip()
+    user_block = f"**{i}. " + _format_cmd(
+        _hhmmss(cmd["timestamp"]),
+        _SOURCE_MAP.get(cmd["source"], ("❓",))[0],
+        cmd.get("risk_level", "unknown"),
+        cmd["command"],
+        output[:200],
+        len(output) > 200,
+    )
+    llm_block = f"{i}. {cmd['command']}\n   Output: {output if output else '(none)'}\n\n"
+    return user_block, llm_block
+
+
+def _format_job_message(status: str, job: dict, terminal_url: str, kind: str = "Job") -> str:
+    """
+    Render the UI message for a job.
+
+    :param status: Job status (``completed``, ``running``, ``failed``; anything else
+                   is shown as queued).
+    :type status: str
+    :param job: Job document as returned by the server.
+    :type job: dict
+    :param terminal_url: Browser URL of the job's terminal session.
+    :type terminal_url: str
+    :param kind: Noun used in the heading (``"Job"`` or ``"Command"``).
+    :type kind: str
+
+    :returns: Markdown message.
+    :rtype: str
+    """
+    msg = _JOB_TEMPLATES.get(status, _JOB_QUEUED_TMPL) % {
+        "kind": kind,
+        "command": job.get("command"),
+        "elapsed": job.get("elapsed_seconds", 0),
+        "remaining": job.get("estimated_remaining", 0),
+        "error": job.get("error", "Unknown error"),
+        "output": job.get("output", "").strip() or "(no output)",
+        "terminal_url": terminal_url,
+    }
+    # e.g. the session shell was restarted, so earlier cd/exports are gone
+    notice = job.get("notice")
+    return f"{msg}\n⚠️ {notice}\n" if notice else msg
+
 
 class Tools:
     """High-level helper for interacting with a secure terminal server.
 
     Manages session creation, command dispatch, job polling, and simple history
-    queries. Most public methods optionally accept an ``__event_emitter__`` callback
-    to push rich status messages back to the OpenWebUI frontend.
+    queries. Every public method is a tool that the model can call, and each is a
+    coroutine (OpenWebUI awaits it). Most optionally accept an
+    ``__event_emitter__`` coroutine function to push rich status messages back
+    to the OpenWebUI frontend.
 
     Environment
     -----------
-    Expects the environment variable ``TERMINAL_API_KEY`` to be set before
-    instantiation. If absent, initialization fails.
+    Expects the environment variable ``TERMINAL_API_KEY`` to be set before the
+    first request to the terminal server. It is read lazily, so the tool can be
+    imported and instantiated (e.g., during OpenWebUI tool discovery) without it.
     """
 
     def __init__(self):
         """
-        Initialize the tool, configure hosts, read API key, and set state.
-
-        :raises RuntimeError: If the environment variable ``TERMINAL_API_KEY`` is not set.
+        Initialize the tool, configure hosts, and set state.
         """
         self.terminal_host_internal = "http://host.docker.internal:7681"
         self.terminal_host_external = "http://localhost:7681"
-
-        # API key for authentication - SET THIS IN ENVIRONMENT VARIABLE IN OPENWEBUI CONTAINER
-        self.api_key = key = os.environ.get("TERMINAL_API_KEY")
-        if not key:
-            raise RuntimeError("TERMINAL_API_KEY is required")
+        # URL prefixes and auth header, built once
+        self._internal_base = self.terminal_host_internal
+        self._external_base = self.terminal_host_external + "/terminal/"
+        # http:// -> ws://, https:// -> wss://
+        self._ws_base = "ws" + self.terminal_host_internal[4:]
+        self._terminal_url_cache = {}
 
         self.current_session_id = None
         self.active_jobs = {}
+        # Sorted keys of active_jobs, for prefix lookups by bisection
+        self._active_jobs_sorted = []
         self.pending_confirmations = {}
+        # (fetched_at, {job_id: job}) from the last batch poll
+        self._batch_cache = (0.0, {})
+        # Conditional GETs: last ETag and document per tracked job
+        self._job_etags = {}
+        self._job_docs = {}
+        # Output received so far per job (fetched as deltas while polling)
+        self._job_output = {}
+        self._job_output_len = {}
+        # session_id -> (expires_at, limit, etag, (history, total)); dropped whenever this tool
+        # starts or finishes a job in the session
+        self._hist_cache = {}
+
+        # aiohttp sessions for the async waits, one per event loop (a session
+        # is bound to the loop that created it); built lazily by _get_http()
+        self._http = {}
+
+    @functools.cached_property
+    def api_key(self):
+        """
+        API key for the terminal server, read from the environment on first use.
 
-    def _make_request(self, method, endpoint, data=None, timeout=10):
+        SET THIS IN ENVIRONMENT VARIABLE IN OPENWEBUI CONTAINER.
+
+        :raises RuntimeError: If the environment variable ``TERMINAL_API_KEY`` is not set.
+        :rtype: str
+        """
+        key = os.environ.get("TERMINAL_API_KEY")
+        if not key:
+            raise RuntimeError("TERMINAL_API_KEY is required")
+        return key
+
+    @functools.cached_property
+    def _auth_header(self):
+        """
+        ``Authorization`` header value, built once from ``api_key``.
+
+        :rtype: str
+        """
+        return f"Bearer {self.api_key}"
+
+    def _close(self):
+        """
+        Release the pooled HTTP connections to the terminal server.
+
+        Each aiohttp session is closed on its own event loop: scheduled there if
+        the loop is running, run to completion if it is idle, and dropped if the
+        loop is already closed (its connections went with it). Safe to call more
+        than once; a session is rebuilt on the next request. Private so that
+        OpenWebUI does not offer it to the model as a tool.
+        """
+        sessions, self._http = self._http, {}
+        for loop, http in sessions.items():
+            if http.closed or loop.is_closed():
+                continue
+            if loop.is_running():
+                asyncio.run_coroutine_threadsafe(http.close(), loop)
+            else:
+                loop.run_until_complete(http.close())
+
+    async def _aclose(self):
+        """
+        Close the aiohttp session of the running loop cleanly, then release the rest.
+        """
+        await self._aclose_http()
+        self._close()
+
+    def __del__(self):
+        try:
+            self._close()
+        except Exception:
+            pass
+
+    def _terminal_url(self, session_id):
+        """
+        Browser URL of a terminal session (memoized per session ID).
+
+        :param session_id: Terminal session identifier.
+        :type session_id: str
+
+        :returns: ``<terminal_host_external>/terminal/<session_id>``.
+        :rtype: str
+        """
+        url = self._terminal_url_cache.get(session_id)
+        if url is None:
+            url = self._terminal_url_cache[session_id] = self._external_base + session_id
+        return url
+
+    async def _emit(self, emitter, content):
+        """
+        Push a message to the OpenWebUI frontend (no-op without an emitter).
+
+        :param emitter: The ``__event_emitter__`` coroutine function received by the tool method.
+        :type emitter: Callable[[dict], Awaitable[Any]] | None
+        :param content: Markdown content of the message.
+        :type content: str
+        """
+        if emitter is None:
+            return
+        payload = _EMIT_SKELETON.copy()
+        payload["data"] = {"content": content}
+        await emitter(payload)
+
+    def _add_job(self, job_id, job):
+        """
+        Track a job in ``self.active_jobs`` and the sorted key index.
+
+        :param job_id: Job identifier returned by the server.
+        :type job_id: str
+        :param job: Local job record.
+        :type job: _JobRec
+        """
+        if job_id not in self.active_jobs:
+            bisect.insort(self._active_jobs_sorted, job_id)
+        self.active_jobs[job_id] = job
+        self._hist_cache.pop(job.session_id, None)
+
+    def _remove_job(self, job_id):
+        """
+        Stop tracking a job (no-op if it is not tracked).
+
+        :param job_id: Job identifier.
+        :type job_id: str
+        """
+        self._job_output.pop(job_id, None)
+        self._job_output_len.pop(job_id, None)
+        self._job_etags.pop(job_id, None)
+        self._job_docs.pop(job_id, None)
+        job = self.active_jobs.pop(job_id, None)
+        if job is not None:
+            # The finished command is now in the session history
+            self._hist_cache.pop(job.session_id, None)
+            keys = self._active_jobs_sorted
+            i = bisect.bisect_left(keys, job_id)
+            if i < len(keys) and keys[i] == job_id:
+                del keys[i]
+
+    def _match_jobs(self, prefix):
+        """
+        Active job IDs starting with ``prefix``, found by two binary searches.
+
+        :param prefix: Partial job ID (e.g. the 8-char prefix shown to the user).
+        :type prefix: str
+
+        :returns: Matching full job IDs, in sorted order.
+        :rtype: list[str]
+        """
+        keys = self._active_jobs_sorted
+        lo = bisect.bisect_left(keys, prefix)
+        hi = bisect.bisect_right(keys, prefix + "\uffff", lo)
+        return keys[lo:hi]
+
+    def _get_http(self):
+        """
+        Return the aiohttp session for the running event loop, creating it if needed.
+
+        :rtype: aiohttp.ClientSession
+        """
+        aiohttp = _import("aiohttp")
+        loop = asyncio.get_running_loop()
+        http = self._http.get(loop)
+        if http is None or http.closed:
+            http = self._http[loop] = aiohttp.ClientSession(
+                headers={
+                    "Authorization": self._auth_header,
+                    "Content-Type": "application/json",
+                },
+                connector=aiohttp.TCPConnector(limit=16, keepalive_timeout=60),
+            )
+        return http
+
+    async def _aclose_http(self):
+        """
+        Close the aiohttp session of the running event loop, if any.
+        """
+        http = self._http.pop(asyncio.get_running_loop(), None)
+        if http is not None:
+            await http.close()
+
+    async def _request_async(self, method, endpoint, data=None, timeout=10, extra_headers=None):
         """
         Make an authenticated request to the terminal server.
 
+        Transient failures are retried with exponential backoff (0.3 s, 0.6 s,
+        1.2 s). Connect errors are retried for every method (nothing was sent);
+        read errors and 502/503/504 responses only for ``GET``, so a command POST
+        is never submitted twice.
+
         :param method: HTTP method to use. Supported values are ``"GET"`` and ``"POST"``.
         :type method: str
         :param endpoint: API path appended to ``self.terminal_host_internal`` to form the full URL
                          (e.g., ``"/api/create_session"``). Typically begins with a leading slash.
         :type endpoint: str
-        :param data: JSON-serializable payload for ``POST`` requests. Ignored for ``GET``.
+        :param data: JSON-serializable payload for ``POST`` requests.
         :type data: dict | list | str | int | float | bool | None
         :param timeout: Maximum number of seconds to wait for a server response.
         :type timeout: int | float
+        :param extra_headers: Headers merged onto the session headers for this request
+                              (e.g., ``If-None-Match``).
+        :type extra_headers: dict | None
 
-        :returns: A ``requests.Response`` on success, or ``None`` if connection error, timeout, or other exception occurs.
-        :rtype: requests.Response | None
+        :returns: ``(status, body, headers)`` on success, or ``None`` if the request still
+                  fails (connection error, timeout) after the retries.
+        :rtype: tuple[int, bytes, Mapping[str, str]] | None
         """
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json",
-        }
-
-        url = f"{self.terminal_host_internal}{endpoint}"
-
-        try:
-            if method == "GET":
-                response = requests.get(url, headers=headers, timeout=timeout)
-            elif method == "POST":
-                response = requests.post(
-                    url, headers=headers, json=data, timeout=timeout
-                )
-            else:
-                raise ValueError(f"Unsupported method: {method}")
-
-            return response
-        except requests.exceptions.ConnectionError:
-            return None
-        except requests.exceptions.Timeout:
-            return None
-        except Exception as e:
-            return None
-
-    def open_terminal(self, __event_emitter__: Callable[[dict], Any] = None) - &gt; str:
+        if method not in ("GET", "POST"):
+            raise ValueError(f"Unsupported method: {method}")
+
+        aiohttp = _import("aiohttp")
+        url = self._internal_base + endpoint
+        body = _dumps(data) if data is not None else None
+
+        for attempt in range(4):
+            if attempt:
+                await asyncio.sleep(0.3 * 2 ** (attempt - 1))
+            last = attempt == 3
+            try:
+                async with self._get_http().request(
+                    method,
+                    url,
+                    data=body,
+                    headers=extra_headers,
+                    timeout=aiohttp.ClientTimeout(total=timeout, sock_connect=3.05),
+                ) as response:
+                    if method == "GET" and response.status in (502, 503, 504) and not last:
+                        continue
+                    return response.status, await response.read(), response.headers
+            except aiohttp.ClientConnectorError:
+                if last:
+                    return None
+            except (aiohttp.ClientError, asyncio.TimeoutError, OSError):
+                if method != "GET" or attempt >= 2:
+                    return None
+        return None
+
+    async def open_terminal(self, __event_emitter__: Callable[[dict], Any] = None) -> str:
         """
         Open a secure interactive terminal session.
 
@@ -102,70 +644,46 @@ class Tools:
                   containing the browser link to the terminal when an emitter is provided.
         :rtype: str
         """
-        session_id = str(uuid.uuid4())
+        session_id = _import("uuid").uuid4().hex
 
         try:
-            response = self._make_request(
-                "POST", "/api/create_session", {"session_id": session_id}
+            response = await self._request_async(
+                "POST", "/api/create_session", {"session_id": session_id}, timeout=30
             )
 
             if response is None:
                 error = "❌ Cannot connect to terminal server. Make sure secure_host_terminal_server.py is running."
-                if __event_emitter__:
-                    __event_emitter__(
-                        {"type": "message", "data": {"content": error}})
+                await self._emit(__event_emitter__, error)
                 return f"ERROR: {error}"
 
-            if response.status_code != 200:
-                error = f"Failed to create terminal session: {response.json().get('error', 'Unknown error')}"
-                if __event_emitter__:
-                    __event_emitter__(
-                        {"type": "message", "data": {"content": f"❌ {error}"}}
-                    )
+            if response[0] != 200:
+                error = f"Failed to create terminal session: {_loads(response[1]).get('error', 'Unknown error')}"
+                await self._emit(__event_emitter__, f"❌ {error}")
                 return f"ERROR: {error}"
 
             self.current_session_id = session_id
 
-            terminal_url = f"{self.terminal_host_external}/terminal/{session_id}"
-
-            user_message = f"""
-            🖥️ **Secure Terminal Session Created**
-
-            **🌐 OPEN TERMINAL HERE:**
-            {terminal_url}
-            
-            **Session ID:** `{session_id}`
-            
-            **🔒 Security Features Active:**
-            - ✓ Command validation and risk assessment
-            - ✓ Dangerous commands are blocked automatically
-            - ✓ High/medium risk commands require your approval
-            - ✓ All activity is logged
-            
-            I can now execute commands. You'll be prompted to approve any potentially risky operations.
-            """
-
-            if __event_emitter__:
-                __event_emitter__(
-                    {"type": "message", "data": {"content": user_message}}
-                )
+            terminal_url = self._terminal_url(session_id)
+
+            user_message = _OPEN_TERMINAL_MSG.format(
+                terminal_url=terminal_url, session_id=session_id)
+
+            await self._emit(__event_emitter__, user_message)
 
             return f"{user_message}"
 
         except Exception as e:
             error = f"Error creating terminal: {str(e)}"
-            if __event_emitter__:
-                __event_emitter__(
-                    {"type": "message", "data": {"content": f"❌ {error}"}}
-                )
+            await self._emit(__event_emitter__, f"❌ {error}")
             return f"ERROR: {error}"
 
-    def send_terminal_command(self, command: str, session_id: str = None, estimated_duration: int = 30, __event_emitter__: Callable[[dict], Any] = None) - &gt; str:
+    async def send_terminal_command(self, command: str, session_id: str = None, estimated_duration: int = 30, __event_emitter__: Callable[[dict], Any] = None) -> str:
         """
         Send a command to the terminal with security validation.
 
         The server will validate the command and either block it, require
-        confirmation, or accept and run it.
+        confirmation, or accept and run it. Confirmation and job waits sleep on
+        the event loop, so concurrent calls share one thread.
 
         :param command: Shell command to execute.
         :type command: str
@@ -185,18 +703,15 @@ class Tools:
         if session_id is None:
             if self.current_session_id is None:
                 error = "No active terminal. Call open_terminal() first."
-                if __event_emitter__:
-                    __event_emitter__(
-                        {"type": "message", "data": {"content": f"❌ {error}"}}
-                    )
+                await self._emit(__event_emitter__, f"❌ {error}")
                 return f"ERROR: {error}"
             session_id = self.current_session_id
 
-        terminal_url = f"{self.terminal_host_external}/terminal/{session_id}"
+        terminal_url = self._terminal_url(session_id)
 
         try:
             # Send command (will be validated by server)
-            response = self._make_request(
+            response = await self._request_async(
                 "POST",
                 "/api/send_async_command",
                 {
@@ -209,32 +724,21 @@ class Tools:
 
             if response is None:
                 error = "Cannot connect to terminal server"
-                if __event_emitter__:
-                    __event_emitter__(
-                        {"type": "message", "data": {"content": f"❌ {error}"}}
-                    )
+                await self._emit(__event_emitter__, f"❌ {error}")
                 return f"ERROR: {error}"
 
-            result = response.json()
+            status_code, body, _ = response
+            result = _loads(body)
 
             # Handle blocked commands
-            if response.status_code == 403:
-                blocked_msg = f"""
-                🚫 **Command Blocked for Security**
-
-                **Command:** `{command}`
-                
-                **Reason:** {result.get('reason', 'Security policy violation')}
-                
-                This command has been blocked to protect your system. It cannot be executed.
-                
-                **💻 [Terminal]({terminal_url})**
-                """
-
-                if __event_emitter__:
-                    __event_emitter__(
-                        {"type": "message", "data": {"content": blocked_msg}}
-                    )
+            if status_code == 403:
+                blocked_msg = _BLOCKED_MSG.format(
+                    command=command,
+                    reason=result.get("reason", "Security policy violation"),
+                    terminal_url=terminal_url,
+                )
+
+                await self._emit(__event_emitter__, blocked_msg)
 
                 return f"BLOCKED: {result.get('reason', 'Security violation')}"
 
@@ -245,38 +749,21 @@ class Tools:
                 risk_reason = result.get("risk_reason", "Requires approval")
 
                 # Track confirmation
-                self.pending_confirmations[confirmation_id] = {
-                    "command": command,
-                    "session_id": session_id,
-                    "risk_level": risk_level,
-                }
+                self.pending_confirmations[confirmation_id] = _ConfRec(
+                    command, session_id, risk_level)
+
+                confirmation_msg = _CONFIRMATION_MSG.format(
+                    risk_emoji="🔴" if risk_level == "high" else "🟡",
+                    risk_level=risk_level.upper(),
+                    command=command,
+                    risk_reason=risk_reason,
+                    terminal_url=terminal_url,
+                )
 
-                risk_emoji = "🔴" if risk_level == "high" else "🟡"
-
-                confirmation_msg = f"""
-                {risk_emoji} **User Confirmation Required**
-
-                **Risk Level:** {risk_level.upper()}
-                **Command:** `{command}`
-                
-                **Why confirmation is needed:**
-                {risk_reason}
-                
-                **What's happening:**
-                I've sent this command for your approval. Please check the terminal window to approve or deny it.
-                
-                **💻 [Open terminal to approve/deny]({terminal_url})**
-                
-                I'll check back to see if you've approved it...
-                """
-
-                if __event_emitter__:
-                    __event_emitter__(
-                        {"type": "message", "data": {"content": confirmation_msg}}
-                    )
+                await self._emit(__event_emitter__, confirmation_msg)
 
                 # Poll for confirmation with smart backoff
-                return self._wait_for_confirmation(
+                return await self._wait_for_confirmation_async(
                     confirmation_id, command, terminal_url, __event_emitter__
                 )
 
@@ -286,56 +773,269 @@ class Tools:
                 risk_level = result.get("risk_level", "low")
 
                 if job_id:
-                    self.active_jobs[job_id] = {
-                        "command": command,
-                        "session_id": session_id,
-                    }
-
-                    start_msg = f"""
-                    ✅ **Command Started**
-
-                    **Command:** `{command}`
-                    **Risk Level:** {risk_level}
-                    **Job ID:** `{job_id[:8]}...`
-                    
-                    The command is now executing.
-                    
-                    **💻 [Watch live]({terminal_url})**
-                    """
-
-                    if __event_emitter__:
-                        __event_emitter__(
-                            {"type": "message", "data": {"content": start_msg}}
-                        )
+                    self._add_job(job_id, _JobRec(command, session_id))
+
+                    start_msg = _START_MSG.format(
+                        command=command,
+                        risk_level=risk_level,
+                        job_prefix=job_id[:8],
+                        terminal_url=terminal_url,
+                    )
+
+                    await self._emit(__event_emitter__, start_msg)
 
                     # Poll for completion
-                    return self._poll_job_with_backoff(
-                        job_id, command, terminal_url, __event_emitter__
+                    return await self._poll_job_with_backoff_async(
+                        job_id, command, terminal_url, __event_emitter__,
+                        estimated_duration,
                     )
                 else:
                     return f"Command sent: {command}"
 
             error = result.get("error", "Unknown error")
-            if __event_emitter__:
-                __event_emitter__(
-                    {"type": "message", "data": {"content": f"❌ {error}"}}
-                )
+            await self._emit(__event_emitter__, f"❌ {error}")
             return f"ERROR: {error}"
 
         except Exception as e:
             error = f"Error: {str(e)}"
-            if __event_emitter__:
-                __event_emitter__(
-                    {"type": "message", "data": {"content": f"❌ {error}"}}
-                )
+            await self._emit(__event_emitter__, f"❌ {error}")
+            return f"ERROR: {error}"
+
+    async def send_terminal_commands(self, commands: list[str], session_id: str = None, estimated_duration: int = 30, __event_emitter__: Callable[[dict], Any] = None) -> str:
+        """
+        Send several independent commands to the terminal in one request.
+
+        The commands run in the given order in the session's shell, each one
+        starting when the previous one ends (so a ``cd`` carries over); a failed
+        command does not stop the ones after it. All commands are submitted through ``/api/send_async_commands`` and their
+        jobs are then followed together with the batch status endpoint, so the
+        whole plan costs one submission and one poll per tick.
+
+        :param commands: Shell commands to execute.
+        :type commands: list[str]
+        :param session_id: Existing session to use. If ``None``, uses ``self.current_session_id``.
+        :type session_id: str | None
+        :param estimated_duration: Best-effort estimate (seconds) for how long each command may take.
+        :type estimated_duration: int
+        :param __event_emitter__: Optional callback to stream status/UX messages to the UI.
+        :type __event_emitter__: Callable[[dict], Any] | None
+
+        :returns: One line per command with its outcome (completed, failed, or still running),
+                  or an error message.
+        :rtype: str
+        """
+        if session_id is None:
+            if self.current_session_id is None:
+                error = "No active terminal. Call open_terminal() first."
+                await self._emit(__event_emitter__, f"❌ {error}")
+                return f"ERROR: {error}"
+            session_id = self.current_session_id
+
+        if not commands:
+            return "ERROR: No commands given"
+
+        terminal_url = self._terminal_url(session_id)
+
+        try:
+            response = await self._request_async(
+                "POST",
+                "/api/send_async_commands",
+                {
+                    "session_id": session_id,
+                    "commands": [
+                        {"command": c, "estimated_duration": estimated_duration}
+                        for c in commands
+                    ],
+                },
+                timeout=15
+            )
+
+            if response is None:
+                error = "Cannot connect to terminal server"
+                await self._emit(__event_emitter__, f"❌ {error}")
+                return f"ERROR: {error}"
+
+            status_code, body, _ = response
+            result = _loads(body)
+
+            if status_code != 200 or not result.get("success"):
+                error = result.get("error") or result.get("detail") or "Unknown error"
+                await self._emit(__event_emitter__, f"❌ {error}")
+                return f"ERROR: {error}"
+
+            job_ids = result.get("job_ids", [])
+            for job_id, command in zip(job_ids, commands):
+                self._add_job(job_id, _JobRec(command, session_id))
+
+            await self._emit(
+                __event_emitter__,
+                _BATCH_START_MSG.format(
+                    count=len(job_ids),
+                    jobs="\n".join(
+                        f"- `{command}` (job `{job_id[:8]}...`)"
+                        for job_id, command in zip(job_ids, commands)
+                    ),
+                    terminal_url=terminal_url,
+                ),
+            )
+
+            outcomes = await self._poll_jobs_until_done_async(
+                job_ids, terminal_url, __event_emitter__, estimated_duration
+            )
+
+            return "\n".join(
+                f"{i}. `{command}`: "
+                + outcomes.get(job_id, f"still running (check job {job_id[:8]})")
+                for i, (job_id, command) in enumerate(zip(job_ids, commands), 1)
+            )
+
+        except Exception as e:
+            error = f"Error: {str(e)}"
+            await self._emit(__event_emitter__, f"❌ {error}")
             return f"ERROR: {error}"
 
-    def _wait_for_confirmation(self, confirmation_id, command, terminal_url, __event_emitter__):
+    async def _poll_jobs_until_done_async(self, job_ids, terminal_url, __event_emitter__, estimated_duration=30):
+        """
+        Follow several jobs with one batch poll per tick until they all finish.
+
+        Uses the same adaptive backoff as ``_poll_job_with_backoff_async``, driven by
+        the smallest ``estimated_remaining`` among the jobs still running. The jobs
+        run one after another, so the wait is capped at ``estimated_duration * 3``
+        seconds per job, plus 10 s.
+
+        :param job_ids: Full job IDs to follow.
+        :type job_ids: list[str]
+        :param terminal_url: Browser URL for the associated terminal session (used in messages).
+        :type terminal_url: str
+        :param __event_emitter__: Optional callback to stream status messages to the UI.
+        :type __event_emitter__: Callable[[dict], Any] | None
+        :param estimated_duration: Caller's estimate (seconds) of each command's duration.
+        :type estimated_duration: int | float
+
+        :returns: Outcome message per finished job (jobs still running are omitted).
+        :rtype: dict[str, str]
+        """
+        deadline = time.monotonic() + estimated_duration * 3 * len(job_ids) + 10
+        pending = list(job_ids)
+        outcomes = {}
+        wait = 0.0
+
+        while pending:
+            if wait > 0:
+                await asyncio.sleep(wait)
+
+            batch = await self._poll_jobs_batch_async(pending, output=False)
+            wait = 30.0
+
+            for job_id in list(pending):
+                job = (batch or {}).get(job_id)
+                if job is None:
+                    continue
+                job["output"] = await self._fetch_output_delta_async(job_id, job)
+                outcome = await self._job_outcome(
+                    job_id, job, job.get("command"), terminal_url, __event_emitter__
+                )
+                if outcome is not None:
+                    outcomes[job_id] = outcome
+                    pending.remove(job_id)
+                else:
+                    wait = min(wait, job.get("estimated_remaining", 0) * 0.4)
+
+            remaining = deadline - time.monotonic()
+            if not pending or remaining <= 0:
+                break
+            wait = min(max(1.0, wait), remaining)
+
+        return outcomes
+
+    async def _watch_ws_async(self, path, done_statuses, budget):
+        """
+        Follow a server push channel until it reports a terminal status.
+
+        :param path: WebSocket path on the terminal server (e.g., ``"/api/ws/job/<id>"``).
+        :type path: str
+        :param done_statuses: Status values that end the wait.
+        :type done_statuses: tuple[str, ...]
+        :param budget: Maximum number of seconds to wait for a terminal status.
+        :type budget: int | float
+
+        :returns: The last message received (with a terminal status, or ``{}``/a non-terminal
+                  status if ``budget`` ran out), or ``None`` if the channel is unavailable
+                  and the caller should fall back to polling.
+        :rtype: dict | None
+        """
+        aiohttp = _import("aiohttp")
+        deadline = time.monotonic() + budget
+        last = {}
+
+        try:
+            ws = await asyncio.wait_for(
+                self._get_http().ws_connect(self._ws_base + path), 5)
+            async with ws:
+                while True:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return last
+                    try:
+                        msg = await ws.receive(timeout=min(remaining, 60))
+                    except asyncio.TimeoutError:
+                        return last
+                    if msg.type is not aiohttp.WSMsgType.TEXT:
+                        return None
+                    last = _loads(msg.data)
+                    if last.get("status") in done_statuses:
+                        return last
+        except (aiohttp.ClientError, asyncio.TimeoutError, OSError, ValueError):
+            return None
+
+    async def _confirmation_outcome(self, status, confirmation_id, command, terminal_url, __event_emitter__):
+        """
+        Report a resolved confirmation.
+
+        :returns: Human-readable outcome if ``status`` is ``approved``, ``denied`` or
+                  ``expired``; ``None`` while the confirmation is still pending.
+        :rtype: str | None
+        """
+        if status == "approved":
+            # Command approved, now wait for it to execute
+            await self._emit(
+                __event_emitter__,
+                f"✅ **Command Approved by User**\n\nExecuting: `{command}`\n\n**💻 [Terminal]({terminal_url})**",
+            )
+
+            # Try to find the job (server creates it after approval)
+            return f"Command approved and executing: {command}"
+
+        elif status == "denied":
+            await self._emit(
+                __event_emitter__,
+                f"❌ **Command Denied by User**\n\nThe command was not executed: `{command}`",
+            )
+
+            if confirmation_id in self.pending_confirmations:
+                del self.pending_confirmations[confirmation_id]
+
+            return f"Command denied by user: {command}"
+
+        elif status == "expired":
+            await self._emit(
+                __event_emitter__,
+                f"⏰ **Confirmation Expired**\n\nYou didn't approve or deny the command in time: `{command}`",
+            )
+
+            if confirmation_id in self.pending_confirmations:
+                del self.pending_confirmations[confirmation_id]
+
+            return f"Confirmation expired: {command}"
+
+        return None
+
+    async def _wait_for_confirmation_async(self, confirmation_id, command, terminal_url, __event_emitter__):
         """
         Wait for user to approve or deny a pending command.
 
-        Polls the confirmation endpoint with a short backoff schedule until the user acts
-        or the polling window is exhausted.
+        Polls the confirmation endpoint with a short backoff schedule until the
+        user acts or the polling window is exhausted.
 
         :param confirmation_id: Server-issued identifier for the pending confirmation.
         :type confirmation_id: str
@@ -350,97 +1050,72 @@ class Tools:
                   expired, or still waiting).
         :rtype: str
         """
-        # Poll: 2s, 5s, 10s, 15s, 20s (total 52s)
+        # Poll after 2s, 5s, 10s, 15s, 20s
         poll_intervals = [2, 3, 5, 5, 5]
 
-        for i, wait_time in enumerate(poll_intervals):
-            time.sleep(wait_time)
+        for wait_time in poll_intervals:
+            await asyncio.sleep(wait_time)
 
-            response = self._make_request(
+            response = await self._request_async(
                 "GET", f"/api/confirmation_status/{confirmation_id}"
             )
 
-            if response and response.status_code == 200:
-                status_data = response.json()
-                status = status_data.get("status")
-
-                if status == "approved":
-                    # Command approved, now wait for it to execute
-                    if __event_emitter__:
-                        __event_emitter__(
-                            {
-                                "type": "message",
-                                "data": {
-                                    "content": f"✅ **Command Approved by User**\n\nExecuting: `{command}`\n\n**💻 [Terminal]({terminal_url})**"
-                                },
-                            }
-                        )
-
-                    # Wait a moment for job to be created
-                    time.sleep(2)
-
-                    # Try to find the job (server creates it after approval)
-                    return f"Command approved and executing: {command}"
-
-                elif status == "denied":
-                    if __event_emitter__:
-                        __event_emitter__(
-                            {
-                                "type": "message",
-                                "data": {
-                                    "content": f"❌ **Command Denied by User**\n\nThe command was not executed: `{command}`"
-                                },
-                            }
-                        )
-
-                    if confirmation_id in self.pending_confirmations:
-                        del self.pending_confirmations[confirmation_id]
-
-                    return f"Command denied by user: {command}"
-
-                elif status == "expired":
-                    if __event_emitter__:
-                        __event_emitter__(
-                            {
-                                "type": "message",
-                                "data": {
-                                    "content": f"⏰ **Confirmation Expired**\n\nYou didn't approve or deny the command in time: `{command}`"
-                                },
-                            }
-                        )
-
-                    if confirmation_id in self.pending_confirmations:
-                        del self.pending_confirmations[confirmation_id]
-
-                    return f"Confirmation expired: {command}"
+            if response and response[0] == 200:
+                status = _loads(response[1]).get("status")
+                outcome = await self._confirmation_outcome(
+                    status, confirmation_id, command, terminal_url, __event_emitter__
+                )
+                if outcome is not None:
+                    if status == "approved":
+                        # Wait a moment for job to be created
+                        await asyncio.sleep(2)
+                    return outcome
 
         # After all polling, still pending
-        final_msg = f"""
-        ⏰ **Still Waiting for Confirmation**
+        final_msg = _STILL_WAITING_MSG.format(
+            command=command,
+            terminal_url=terminal_url,
+            confirmation_prefix=confirmation_id[:8],
+        )
 
-        **Command:** `{command}`
-        
-        I've checked multiple times but you haven't approved or denied this command yet.
-        
-        **What to do:**
-        1. **Open the terminal:** {terminal_url}
-        2. **Click Approve or Deny** in the confirmation dialog
-        3. **Tell me** "check if command was approved" and I'll continue
-        
-        **Confirmation ID:** `{confirmation_id[:8]}...`
+        await self._emit(__event_emitter__, final_msg)
+
+        return f"Awaiting user confirmation for: {command}. Session: {terminal_url}. Confirmation ID: {confirmation_id}"
+
+    async def _job_outcome(self, job_id, job, command, terminal_url, __event_emitter__):
         """
+        Report a finished job.
 
-        if __event_emitter__:
-            __event_emitter__(
-                {"type": "message", "data": {"content": final_msg}})
+        :returns: Human-readable outcome if the job ``completed`` or ``failed``;
+                  ``None`` while it is still running.
+        :rtype: str | None
+        """
+        status = job.get("status")
 
-        return f"Awaiting user confirmation for: {command}. Session: {terminal_url}. Confirmation ID: {confirmation_id}"
+        if status not in ("completed", "failed"):
+            return None
 
-    def _poll_job_with_backoff(self, job_id, command, terminal_url, __event_emitter__):
+        msg = _format_job_message(status, job, terminal_url, kind="Command")
+
+        await self._emit(__event_emitter__, msg)
+
+        self._remove_job(job_id)
+
+        if status == "completed":
+            outcome = f"Command completed. Output: {job.get('output', '').strip()}"
+        else:
+            outcome = f"Command failed: {job.get('error', 'Unknown error')}"
+        notice = job.get("notice")
+        return f"{outcome}\nNote: {notice}" if notice else outcome
+
+    async def _poll_job_with_backoff_async(self, job_id, command, terminal_url, __event_emitter__, estimated_duration=30):
         """
-        Poll a job's status with progressive backoff.
+        Wait for a job to finish.
 
-        Checks job status several times with increasing delays, reporting completion
+        Subscribes to the job push channel when the server offers one; otherwise
+        polls job status, sleeping for a fraction of the server's
+        ``estimated_remaining`` between checks (1-30 s). Either way the wait is
+        capped at ``estimated_duration * 3 + 10`` seconds. Reports completion
         output, failure reason, or continued execution.
 
         :param job_id: Unique identifier of the job created by the server.
@@ -451,97 +1126,155 @@ class Tools:
         :type terminal_url: str
         :param __event_emitter__: Optional callback to stream status messages to the UI.
         :type __event_emitter__: Callable[[dict], Any] | None
+        :param estimated_duration: Caller's estimate (seconds) of the command duration.
+        :type estimated_duration: int | float
 
         :returns: Human-readable message describing the job outcome or that it is still running.
         :rtype: str
         """
-        poll_intervals = [0, 2, 5, 10, 20]
-
-        for i, wait_time in enumerate(poll_intervals):
-            if wait_time & gt; 0:
-                time.sleep(wait_time)
+        budget = estimated_duration * 3 + 10
+
+        update = await self._watch_ws_async(
+            f"/api/ws/job/{job_id}", ("completed", "failed"), budget
+        )
+
+        if update is not None:
+            outcome = await self._job_outcome(
+                job_id, update, command, terminal_url, __event_emitter__)
+            if outcome is not None:
+                return outcome
+        else:
+            deadline = time.monotonic() + budget
+            wait = 0.0
+
+            while True:
+                if wait > 0:
+                    await asyncio.sleep(wait)
+
+                # One request per tick covers every job this tool is tracking;
+                # output is left out and fetched below as a delta
+                job_ids = list(self.active_jobs)
+                if job_id not in self.active_jobs:
+                    job_ids.append(job_id)
+                batch = await self._poll_jobs_batch_async(job_ids, output=False)
+
+                if batch and job_id in batch:
+                    job = batch[job_id]
+                    job["output"] = await self._fetch_output_delta_async(job_id, job)
+                    outcome = await self._job_outcome(
+                        job_id, job, command, terminal_url, __event_emitter__
+                    )
+                    if outcome is not None:
+                        return outcome
+                    wait = job.get("estimated_remaining", 0) * 0.4
+                else:
+                    wait = 0.0
 
-            response = self._make_request("GET", f"/api/job/{job_id}")
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                wait = min(max(1.0, min(wait, 30.0)), remaining)
 
-            if response and response.status_code == 200:
-                job = response.json()
-                status = job.get("status")
+        # Still running after all polls
+        final_msg = _STILL_RUNNING_MSG.format(
+            command=command,
+            budget=budget,
+            terminal_url=terminal_url,
+            job_prefix=job_id[:8],
+        )
 
-                if status == "completed":
-                    output = job.get("output", "").strip()
-                    elapsed = job.get("elapsed_seconds", 0)
+        await self._emit(__event_emitter__, final_msg)
 
-                    msg = f"""
-                    ✅ **Command Completed**
+        return f"{final_msg}"
 
-                    **Command:** `{command}`
-                    **Duration:** {elapsed:.1f} seconds
-                    
-                    **Output:**
-                    {output if output else '(no output)'}
-                    
-                    **💻 [View in terminal]({terminal_url})**
-                    """
+    async def _poll_jobs_batch_async(self, job_ids, output=True):
+        """
+        Fetch the status of several jobs in a single request.
 
-                    if __event_emitter__:
-                        __event_emitter__(
-                            {"type": "message", "data": {"content": msg}})
+        The result is kept for 250 ms so that a ``check_job`` right after a poll
+        tick is answered from memory.
 
-                    if job_id in self.active_jobs:
-                        del self.active_jobs[job_id]
+        :param job_ids: Full job IDs to fetch.
+        :type job_ids: list[str]
+        :param output: Include each job's ``output``. When ``False`` the server sends
+                       ``output_length`` instead (see ``_fetch_output_delta_async``).
+        :type output: bool
 
-                    return f"Command completed. Output: {output}"
+        :returns: Mapping of job ID to job document (unknown IDs are omitted), or
+                  ``None`` if the request failed.
+        :rtype: dict[str, dict] | None
+        """
+        endpoint = "/api/jobs/batch" if output else "/api/jobs/batch?output=false"
+        response = await self._request_async("POST", endpoint, {"job_ids": job_ids})
 
-                elif status == "failed":
-                    error = job.get("error", "Unknown error")
+        if response is None or response[0] != 200:
+            return None
 
-                    msg = f"""
-                    ❌ **Command Failed**
+        result = _loads(response[1]).get("jobs", {})
+        self._batch_cache = (time.monotonic(), result)
+        return result
 
-                    **Command:** `{command}`
-                    **Error:** {error}
-                    
-                    **💻 [Terminal]({terminal_url})**
-                    """
+    def _recent_batch_job(self, job_id):
+        """
+        Return ``job_id`` from the last batch poll if it is at most 250 ms old.
 
-                    if __event_emitter__:
-                        __event_emitter__(
-                            {"type": "message", "data": {"content": msg}})
+        :rtype: dict | None
+        """
+        fetched_at, result = self._batch_cache
+        if time.monotonic() - fetched_at > 0.25:
+            return None
+        job = result.get(job_id)
+        # Polls made without output only carry it for the job being waited on
+        if job is None or "output" not in job:
+            return None
+        return job
 
-                    if job_id in self.active_jobs:
-                        del self.active_jobs[job_id]
+    async def _fetch_output_delta_async(self, job_id, job):
+        """
+        Bring the local output buffer of a job up to date.
 
-                    return f"Command failed: {error}"
+        Only the characters past what was already received are requested, from
+        ``/api/job/{job_id}/output?start=N``. If the server already dropped the
+        start of that range from its bounded buffer (``X-Output-Start`` past
+        ``N``), the local buffer restarts from what it sent. Like the server's, the
+        buffer keeps only the last ``_OUTPUT_MAX`` characters.
 
-        # Still running after all polls
-        final_msg = f"""
-        ⏰ **Command Still Running**
+        :param job_id: Full job ID.
+        :type job_id: str
+        :param job: Job document fetched without output (carries ``output_length``).
+        :type job: dict
 
-        **Command:** `{command}`
-        
-        I've checked {len(poll_intervals)} times but the command is still executing.
-        
-        **What to do:**
-        1. **Watch it live:** {terminal_url}
-        2. **When done, tell me:** "check job {job_id[:8]}" or "show recent commands"
-        
-        I'll retrieve and analyze the results when you're ready!
+        :returns: The job output received so far.
+        :rtype: str
         """
+        known = self._job_output_len.get(job_id, 0)
 
-        if __event_emitter__:
-            __event_emitter__(
-                {"type": "message", "data": {"content": final_msg}})
+        if job.get("output_length", 0) > known:
+            response = await self._request_async(
+                "GET", f"/api/job/{job_id}/output?start={known}")
 
-        return f"{final_msg}"
+            if response is not None and response[0] == 200:
+                _, body, headers = response
+                delta = body.decode("utf-8", "replace")
+                if int(headers.get("X-Output-Start", known)) > known:
+                    output = delta
+                else:
+                    output = self._job_output.get(job_id, "") + delta
+                self._job_output[job_id] = output[-_OUTPUT_MAX:]
+                self._job_output_len[job_id] = int(
+                    headers.get("X-Output-Length", known + len(delta))
+                )
 
-    def check_job(self, job_id: str, __event_emitter__: Callable[[dict], Any] = None) - &gt; str:
+        return self._job_output.get(job_id, "")
+
+    async def check_job(self, job_id: str, __event_emitter__: Callable[[dict], Any] = None) -> str:
         """
         Check the status and results of a background job.
 
         Accepts partial job IDs and resolves to a single match from
         ``self.active_jobs`` when possible.
 
-        :param job_id: The job ID to check. If shorter than 36 characters, a unique prefix is allowed.
+        :param job_id: The job ID to check. If shorter than 32 characters, a unique prefix is allowed.
         :type job_id: str
         :param __event_emitter__: Optional callback to stream status messages to the UI.
         :type __event_emitter__: Callable[[dict], Any] | None
@@ -550,140 +1283,123 @@ class Tools:
         :rtype: str
         """
         # If partial job_id, try to find match
-        if len(job_id) & lt; 36:
-            matching = [
-                jid for jid in self.active_jobs.keys() if jid.startswith(job_id)
-            ]
+        if len(job_id) < 32:
+            matching = self._match_jobs(job_id)
             if len(matching) == 1:
                 job_id = matching[0]
-            elif len(matching) & gt; 1:
+            elif len(matching) > 1:
                 error = f"Multiple jobs match '{job_id}'"
-                if __event_emitter__:
-                    __event_emitter__(
-                        {"type": "message", "data": {"content": f"❌ {error}"}}
-                    )
+                await self._emit(__event_emitter__, f"❌ {error}")
                 return f"ERROR: {error}"
 
         try:
-            response = self._make_request("GET", f"/api/job/{job_id}")
+            # A batch poll may have fetched this job a moment ago
+            job = self._recent_batch_job(job_id)
+
+            if job is None:
+                response = await self._request_async(
+                    "GET", f"/api/job/{job_id}",
+                    extra_headers={"If-None-Match": self._job_etags.get(job_id, "")},
+                    timeout=30,
+                )
 
-            if response is None:
-                error = "Cannot connect to terminal server"
-                if __event_emitter__:
-                    __event_emitter__(
-                        {"type": "message", "data": {"content": f"❌ {error}"}}
-                    )
-                return f"ERROR: {error}"
+                if response is None:
+                    error = "Cannot connect to terminal server"
+                    await self._emit(__event_emitter__, f"❌ {error}")
+                    return f"ERROR: {error}"
+
+                status_code, body, headers = response
+
+                if status_code == 404:
+                    error = "Job not found or expired"
+                    await self._emit(__event_emitter__, f"❌ {error}")
+                    return f"ERROR: {error}"
+
+                if status_code == 304 and job_id in self._job_docs:
+                    # Unchanged since the last check: skip the body entirely
+                    job = self._job_docs[job_id]
+                elif status_code != 200:
+                    error = "Failed to fetch job status"
+                    await self._emit(__event_emitter__, f"❌ {error}")
+                    return f"ERROR: {error}"
+                else:
+                    job = _loads(body)
+                    etag = headers.get("ETag")
+                    # Kept only for tracked jobs, so _remove_job can drop them
+                    if etag and job_id in self.active_jobs:
+                        self._job_etags[job_id] = etag
+                        self._job_docs[job_id] = job
 
-            if response.status_code == 200:
-                job = response.json()
-                status = job.get("status")
-                command = job.get("command")
-                session_id = job.get("session_id")
-                terminal_url = f"{self.terminal_host_external}/terminal/{session_id}"
+            status = job.get("status")
+            terminal_url = self._terminal_url(job.get("session_id"))
+            msg = _format_job_message(status, job, terminal_url)
 
-                if status == "completed":
-                    output = job.get("output", "").strip()
-                    elapsed = job.get("elapsed_seconds", 0)
-
-                    msg = f"""
-                    ✅ **Job Completed**
-
-                    **Command:** `{command}`
-                    **Duration:** {elapsed:.1f} seconds
-                    
-                    **Output:**
-                    {output if output else '(no output)'}
-                    
-                    **💻 [Terminal]({terminal_url})**
-                    """
-
-                    if __event_emitter__:
-                        __event_emitter__(
-                            {"type": "message", "data": {"content": msg}})
-
-                    return f"{msg}"
-
-                elif status == "running":
-                    elapsed = job.get("elapsed_seconds", 0)
-                    remaining = job.get("estimated_remaining", 0)
-
-                    msg = f"""
-                    ⚙️ **Job Running**
-
-                    **Command:** `{command}`
-                    **Elapsed:** {elapsed:.0f} seconds
-                    **Estimated remaining:** ~{remaining:.0f} seconds
-                    
-                    **💻 [Watch live]({terminal_url})**
-                    """
-
-                    if __event_emitter__:
-                        __event_emitter__(
-                            {"type": "message", "data": {"content": msg}})
-
-                    return f"{msg}"
-
-                elif status == "failed":
-                    error = job.get("error", "Unknown error")
-
-                    msg = f"""
-                    ❌ **Job Failed**
-
-                    **Command:** `{command}`
-                    **Error:** {error}
-                    
-                    **💻 [Terminal]({terminal_url})**
-                    """
-
-                    if __event_emitter__:
-                        __event_emitter__(
-                            {"type": "message", "data": {"content": msg}})
-
-                    return f"Job failed: {error}"
-
-                else:  # queued
-                    msg = f"""
-                    ⏳ **Job Queued**
-
-                    **Command:** `{command}`
-                    
-                    The job is waiting to execute.
-                    
-                    **💻 [Terminal]({terminal_url})**
-                    """
-
-                    if __event_emitter__:
-                        __event_emitter__(
-                            {"type": "message", "data": {"content": msg}})
-
-                    return f"{msg}"
-
-            elif response.status_code == 404:
-                error = "Job not found or expired"
-                if __event_emitter__:
-                    __event_emitter__(
-                        {"type": "message", "data": {"content": f"❌ {error}"}}
-                    )
-                return f"ERROR: {error}"
+            await self._emit(__event_emitter__, msg)
 
-            else:
+            if status == "failed":
+                return f"Job failed: {job.get('error', 'Unknown error')}"
+            return msg
+
+        except Exception as e:
+            error = f"Error: {str(e)}"
+            await self._emit(__event_emitter__, f"❌ {error}")
+            return f"ERROR: {error}"
+
+    async def check_jobs(self, job_ids: list[str], __event_emitter__: Callable[[dict], Any] = None) -> str:
+        """
+        Check the status of several background jobs with a single request.
+
+        :param job_ids: Job IDs to check. Unique prefixes of tracked jobs are allowed.
+        :type job_ids: list[str]
+        :param __event_emitter__: Optional callback to stream a status summary to the UI.
+        :type __event_emitter__: Callable[[dict], Any] | None
+
+        :returns: One status line per job, or an error message.
+        :rtype: str
+        """
+        resolved = []
+        for job_id in job_ids:
+            if len(job_id) < 32:
+                matching = self._match_jobs(job_id)
+                if len(matching) == 1:
+                    job_id = matching[0]
+            resolved.append(job_id)
+
+        try:
+            batch = await self._poll_jobs_batch_async(resolved)
+
+            if batch is None:
                 error = "Failed to fetch job status"
-                if __event_emitter__:
-                    __event_emitter__(
-                        {"type": "message", "data": {"content": f"❌ {error}"}}
-                    )
+                await self._emit(__event_emitter__, f"❌ {error}")
                 return f"ERROR: {error}"
 
+            lines = []
+            for job_id in resolved:
+                job = batch.get(job_id)
+                if job is None:
+                    lines.append(f"- `{job_id[:8]}` not found or expired")
+                    continue
+
+                line = f"- `{job_id[:8]}` **{job.get('status')}**: `{job.get('command')}`"
+                if job.get("status") == "completed":
+                    output = job.get("output", "").strip()
+                    line += f"\n  Output: {output if output else '(no output)'}"
+                elif job.get("status") == "failed":
+                    line += f"\n  Error: {job.get('error', 'Unknown error')}"
+                lines.append(line)
+
+            msg = "**📋 Job Status**\n\n" + "\n".join(lines)
+
+            await self._emit(__event_emitter__, msg)
+
+            return msg
+
         except Exception as e:
             error = f"Error: {str(e)}"
-            if __event_emitter__:
-                __event_emitter__(
-                    {"type": "message", "data": {"content": f"❌ {error}"}}
-                )
+            await self._emit(__event_emitter__, f"❌ {error}")
             return f"ERROR: {error}"
 
-    def get_last_command(self, session_id: str = None, __event_emitter__: Callable[[dict], Any] = None) - &gt; str:
+    async def get_last_command(self, session_id: str = None, __event_emitter__: Callable[[dict], Any] = None) -> str:
         """
         Get the most recent command executed in a session and its output.
 
@@ -700,91 +1416,64 @@ class Tools:
 
         if session_id is None:
             error = "No active session"
-            if __event_emitter__:
-                __event_emitter__(
-                    {"type": "message", "data": {"content": f"❌ {error}"}}
-                )
+            await self._emit(__event_emitter__, f"❌ {error}")
             return f"ERROR: {error}"
 
-        terminal_url = f"{self.terminal_host_external}/terminal/{session_id}"
+        terminal_url = self._terminal_url(session_id)
 
         try:
-            response = self._make_request(
-                "GET", f"/api/command_history/{session_id}")
+            response = await self._request_async(
+                "GET", f"/api/command_history/{session_id}?limit=1&order=desc")
 
             if response is None:
                 error = "Cannot connect to terminal server"
-                if __event_emitter__:
-                    __event_emitter__(
-                        {"type": "message", "data": {"content": f"❌ {error}"}}
-                    )
+                await self._emit(__event_emitter__, f"❌ {error}")
                 return f"ERROR: {error}"
 
-            if response.status_code == 200:
-                result = response.json()
+            if response[0] == 200:
+                result = _loads(response[1])
                 history = result.get("history", [])
 
                 if not history:
                     msg = f"No commands executed yet.\n\n**💻 [Terminal]({terminal_url})**"
-                    if __event_emitter__:
-                        __event_emitter__(
-                            {"type": "message", "data": {"content": msg}})
+                    await self._emit(__event_emitter__, msg)
                     return msg
 
-                last_cmd = history[-1]
-                ts = datetime.fromisoformat(
-                    last_cmd["timestamp"]).strftime("%H:%M:%S")
+                # Older servers ignore the query string and send everything
+                last_cmd = history[0] if result.get("order") == "desc" else history[-1]
+                ts = _hhmmss(last_cmd["timestamp"])
 
-                source_map = {
-                    "llm": ("🤖", "Assistant"),
-                    "llm_async": ("🔄", "Assistant (async)"),
-                    "user": ("👤", "User"),
-                }
-                source_icon, source_label = source_map.get(
+                source_icon, source_label = _SOURCE_MAP.get(
                     last_cmd["source"], ("❓", "Unknown")
                 )
 
                 output = last_cmd.get("output", "").strip()
-                risk_level = last_cmd.get("risk_level", "unknown")
-
-                user_msg = f"""
-                **📋 Last Command**
-
-                **{source_icon} Source:** {source_label}
-                **Time:** {ts}
-                **Command:** `{last_cmd['command']}`
-                **Risk Level:** {risk_level}
-                
-                **Output:**
-                {output if output else '(no output captured)'}
-                
-                **💻 [Terminal]({terminal_url})**
-                """
-
-                if __event_emitter__:
-                    __event_emitter__(
-                        {"type": "message", "data": {"content": user_msg}}
-                    )
+
+                user_msg = _LAST_COMMAND_TMPL % {
+                    "source_icon": source_icon,
+                    "source_label": source_label,
+                    "ts": ts,
+                    "command": last_cmd["command"],
+                    "risk_level": last_cmd.get("risk_level", "unknown"),
+                    "output": output or "(no output captured)",
+                    "terminal_url": terminal_url,
+                }
+
+                await self._emit(__event_emitter__, user_msg)
 
                 return f"Last command: {last_cmd['command']}. Output: {output if output else '(no output)'}"
 
             else:
                 error = "Failed to fetch command history"
-                if __event_emitter__:
-                    __event_emitter__(
-                        {"type": "message", "data": {"content": f"❌ {error}"}}
-                    )
+                await self._emit(__event_emitter__, f"❌ {error}")
                 return f"ERROR: {error}"
 
         except Exception as e:
             error = f"Error: {str(e)}"
-            if __event_emitter__:
-                __event_emitter__(
-                    {"type": "message", "data": {"content": f"❌ {error}"}}
-                )
+            await self._emit(__event_emitter__, f"❌ {error}")
             return f"ERROR: {error}"
 
-    def get_recent_commands(self, count: int = 5, session_id: str = None, __event_emitter__: Callable[[dict], Any] = None) - &gt; str:
+    async def get_recent_commands(self, count: int = 5, session_id: str = None, __event_emitter__: Callable[[dict], Any] = None) -> str:
         """
         Get the last N commands (with truncated outputs) for a session.
 
@@ -803,84 +1492,94 @@ class Tools:
 
         if session_id is None:
             error = "No active session"
-            if __event_emitter__:
-                __event_emitter__(
-                    {"type": "message", "data": {"content": f"❌ {error}"}}
-                )
+            await self._emit(__event_emitter__, f"❌ {error}")
             return f"ERROR: {error}"
 
-        terminal_url = f"{self.terminal_host_external}/terminal/{session_id}"
+        terminal_url = self._terminal_url(session_id)
 
         try:
-            response = self._make_request(
-                "GET", f"/api/command_history/{session_id}")
+            cached = await self._history_async(session_id, count)
 
-            if response is None or response.status_code != 200:
+            if cached is None:
                 error = "Failed to fetch command history"
-                if __event_emitter__:
-                    __event_emitter__(
-                        {"type": "message", "data": {"content": f"❌ {error}"}}
-                    )
+                await self._emit(__event_emitter__, f"❌ {error}")
                 return f"ERROR: {error}"
 
-            result = response.json()
-            history = result.get("history", [])
+            history, total = cached
 
             if not history:
                 msg = f"No commands executed yet.\n\n**💻 [Terminal]({terminal_url})**"
-                if __event_emitter__:
-                    __event_emitter__(
-                        {"type": "message", "data": {"content": msg}})
+                await self._emit(__event_emitter__, msg)
                 return msg
 
-            recent = history[-count:] if len(history) & gt
-            = count else history
+            # Older servers ignore ?limit and send everything
+            recent = history[-count:] if len(history) >= count else history
 
-            user_msg = f"""
-            **📋 Recent Commands** (Last {len(recent)} of {len(history)} total)
+            user_blocks, llm_blocks = zip(
+                *(_render_recent(i, cmd) for i, cmd in enumerate(recent, 1))
+            )
 
-            **💻 [Terminal]({terminal_url})**            
-            """
+            user_msg = _RECENT_HEADER_MSG.format(
+                shown=len(recent), total=total, terminal_url=terminal_url
+            ) + "".join(user_blocks)
 
-            llm_response = f"Last {len(recent)} commands:\n\n"
+            await self._emit(__event_emitter__, user_msg)
 
-            source_map = {"llm": "🤖", "llm_async": "🔄", "user": "👤"}
+            return f"Last {len(recent)} commands:\n\n" + "".join(llm_blocks)
 
-            for i, cmd in enumerate(recent, 1):
-                ts = datetime.fromisoformat(
-                    cmd["timestamp"]).strftime("%H:%M:%S")
-                icon = source_map.get(cmd["source"], "❓")
-                output = cmd.get("output", "").strip()
-                risk = cmd.get("risk_level", "unknown")
+        except Exception as e:
+            error = f"Error: {str(e)}"
+            await self._emit(__event_emitter__, f"❌ {error}")
+            return f"ERROR: {error}"
 
-                user_msg += f"**{i}. {icon}** {ts} - Risk: {risk}\n"
-                user_msg += f"**Command:** `{cmd['command']}`\n"
-                if output:
-                    display = output[:200] + "..." if len(output) & gt
-                    200 else output
-                    user_msg += f"**Output:**\n```\n{display}\n```\n"
-                else:
-                    user_msg += "*No output*\n"
-                user_msg += "\n"
+    async def _history_async(self, session_id, limit):
+        """
+        Tail of a session's command history, cached for ``_HIST_TTL`` seconds.
 
-                llm_response += f"{i}. {cmd['command']}\n"
-                llm_response += f"   Output: {output if output else '(none)'}\n\n"
+        Only the last ``limit`` entries are requested (``?limit=N``). After the
+        TTL the server is asked again with ``If-None-Match``, so an unchanged
+        history costs a bodiless 304.
 
-            if __event_emitter__:
-                __event_emitter__(
-                    {"type": "message", "data": {"content": user_msg}})
+        :param session_id: Session to inspect.
+        :type session_id: str
+        :param limit: Number of most-recent entries wanted.
+        :type limit: int
 
-            return llm_response
+        :returns: ``(entries oldest first, total history length)``, or ``None`` if the
+                  request failed.
+        :rtype: tuple[list[dict], int] | None
+        """
+        cached = self._hist_cache.get(session_id)
+        if cached is not None and cached[1] != limit:
+            cached = None
+        if cached is not None and cached[0] > time.monotonic():
+            return cached[3]
+
+        response = await self._request_async(
+            "GET",
+            f"/api/command_history/{session_id}?limit={limit}",
+            extra_headers={"If-None-Match": cached[2]} if cached else None,
+        )
+
+        if response is None:
+            return None
 
-        except Exception as e:
-            error = f"Error: {str(e)}"
-            if __event_emitter__:
-                __event_emitter__(
-                    {"type": "message", "data": {"content": f"❌ {error}"}}
-                )
-            return f"ERROR: {error}"
+        status, body, headers = response
+        if status == 304 and cached is not None:
+            result = cached[3]
+        elif status == 200:
+            doc = _loads(body)
+            history = doc.get("history", [])
+            result = (history, doc.get("total", len(history)))
+        else:
+            return None
+
+        self._hist_cache[session_id] = (
+            time.monotonic() + _HIST_TTL, limit, headers.get("ETag", ""), result
+        )
+        return result
 
-    def get_terminal_link(self, session_id: str = None, __event_emitter__: Callable[[dict], Any] = None) - &gt; str:
+    async def get_terminal_link(self, session_id: str = None, __event_emitter__: Callable[[dict], Any] = None) -> str:
         """
         Get the browser link for the current or specified terminal session.
 
@@ -897,28 +1596,19 @@ class Tools:
 
         if session_id is None:
             error = "No active terminal session"
-            if __event_emitter__:
-                __event_emitter__(
-                    {"type": "message", "data": {"content": f"❌ {error}"}}
-                )
+            await self._emit(__event_emitter__, f"❌ {error}")
             return f"ERROR: {error}"
 
-        terminal_url = f"{self.terminal_host_external}/terminal/{session_id}"
+        terminal_url = self._terminal_url(session_id)
 
-        msg = f"""
-        **🖥️ Secure Terminal Link**
+        msg = _TERMINAL_LINK_MSG.format(
+            terminal_url=terminal_url, session_id=session_id)
 
-        {terminal_url}
-        
-        **Session ID:** `{session_id}`
-        """
-
-        if __event_emitter__:
-            __event_emitter__({"type": "message", "data": {"content": msg}})
+        await self._emit(__event_emitter__, msg)
 
         return terminal_url
 
-    def close_terminal(self, session_id: str = None, __event_emitter__: Callable[[dict], Any] = None) - &gt; str:
+    async def close_terminal(self, session_id: str = None, __event_emitter__: Callable[[dict], Any] = None) -> str:
         """
         Close a terminal session.
 
@@ -935,38 +1625,28 @@ class Tools:
 
         if session_id is None:
             error = "No active session to close"
-            if __event_emitter__:
-                __event_emitter__(
-                    {"type": "message", "data": {"content": f"❌ {error}"}}
-                )
+            await self._emit(__event_emitter__, f"❌ {error}")
             return f"ERROR: {error}"
 
         try:
-            response = self._make_request(
+            response = await self._request_async(
                 "POST", f"/api/close_session/{session_id}")
 
-            if response and response.status_code == 200:
+            if response and response[0] == 200:
                 msg = f"✓ Closed terminal session `{session_id[:8]}...`"
-                if __event_emitter__:
-                    __event_emitter__(
-                        {"type": "message", "data": {"content": msg}})
+                await self._emit(__event_emitter__, msg)
 
                 if self.current_session_id == session_id:
                     self.current_session_id = None
+                self._hist_cache.pop(session_id, None)
 
                 return msg
             else:
                 error = "Failed to close session"
-                if __event_emitter__:
-                    __event_emitter__(
-                        {"type": "message", "data": {"content": f"❌ {error}"}}
-                    )
+                await self._emit(__event_emitter__, f"❌ {error}")
                 return f"ERROR: {error}"
 
         except Exception as e:
             error = f"Error: {str(e)}"
-            if __event_emitter__:
-                __event_emitter__(
-                    {"type": "message", "data": {"content": f"❌ {error}"}}
-                )
+            await self._emit(__event_emitter__, f"❌ {error}")
             return f"ERROR: {error}"
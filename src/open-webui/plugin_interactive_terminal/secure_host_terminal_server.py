@@ -5,13 +5,28 @@ Versão: 1.1 (Correção de autenticação)
 
 import os
 import uuid
+import codecs
+import hmac
+import hashlib
+import time
+import signal
 import asyncio
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field, fields
 from datetime import datetime
-from typing import Dict, Optional
-from fastapi import FastAPI, HTTPException, Header, Depends
-from fastapi.responses import HTMLResponse
+from itertools import islice
+from typing import Dict, List, Optional
+from fastapi import FastAPI, HTTPException, Header, Depends, Query, WebSocket, WebSocketDisconnect, Response, Cookie
+from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.staticfiles import StaticFiles
+from fastapi.responses import HTMLResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
 import uvicorn
+import orjson
+from cachetools import LRUCache
+from itsdangerous import URLSafeTimedSerializer, BadSignature
 
 # ============================================================================
 # CONFIGURAÇÃO
@@ -20,9 +35,42 @@ import uvicorn
 API_KEY = os.getenv("TERMINAL_API_KEY")
 if not API_KEY:
     raise RuntimeError("TERMINAL_API_KEY environment variable is required")
+# Codificada uma vez para a comparação em tempo constante
+API_KEY_BYTES = API_KEY.encode()
 
 PORT = int(os.getenv("TERMINAL_PORT", "7681"))
 HOST = os.getenv("TERMINAL_HOST", "0.0.0.0")
+# Assina o cookie que dá acesso do navegador ao stream de uma sessão
+COOKIE_SECRET = os.getenv("TERMINAL_COOKIE_SECRET") or API_KEY
+COOKIE_NAME = "term_tok"
+COOKIE_MAX_AGE = int(os.getenv("TERMINAL_COOKIE_MAX_AGE", "43200"))
+_cookie_signer = URLSafeTimedSerializer(COOKIE_SECRET, salt="terminal-stream")
+
+# CSS/JS da página do terminal
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+
+# Tempo máximo de um comando no shell persistente (depois disso o shell é recriado)
+COMMAND_TIMEOUT = float(os.getenv("COMMAND_TIMEOUT", "3600"))
+# Vai no job quando o comando roda num shell recriado
+SHELL_RESET_NOTICE = (
+    "Session shell was restarted before this command: the working directory "
+    "and variables from earlier commands were lost"
+)
+
+# Quanto de stdout/stderr cada job guarda (só o final; em caracteres)
+MAX_OUTPUT_CHARS = int(os.getenv("MAX_OUTPUT_CHARS", str(1024 * 1024)))
+
+# Máximo de comandos guardados por sessão (os mais antigos são descartados)
+HIST_MAX = int(os.getenv("HIST_MAX", "1000"))
+# Quanto de stdout/stderr cada comando guarda no histórico (só o final; o
+# output completo fica no job enquanto ele estiver no cache)
+HIST_OUTPUT_CHARS = int(os.getenv("HIST_OUTPUT_CHARS", str(64 * 1024)))
+# Máximo de jobs mantidos em memória (os menos consultados saem primeiro)
+JOBS_MAX = int(os.getenv("JOBS_MAX", "10000"))
+
+# Eventos pendentes por navegador no stream SSE; quem não acompanha é
+# desconectado e retoma pelo Last-Event-ID
+SSE_QUEUE_MAX = 256
 
 # ============================================================================
 # MODELOS
@@ -38,44 +86,388 @@ class SendCommandRequest(BaseModel):
     command: str
     estimated_duration: int = 30
 
+
+class CommandSpec(BaseModel):
+    command: str
+    estimated_duration: int = 30
+
+
+class SendCommandsRequest(BaseModel):
+    session_id: str
+    commands: List[CommandSpec]
+
+
+class JobsBatchRequest(BaseModel):
+    job_ids: List[str]
+
+
+class OutputTail:
+    """
+    Final de um stream de saída, com no máximo MAX_OUTPUT_CHARS caracteres.
+
+    Os pedaços chegam em bytes e são decodificados incrementalmente (um
+    caractere UTF-8 pode vir partido entre dois reads). `dropped` conta o que
+    já foi descartado do começo, e `total` o que foi escrito desde o início.
+    """
+
+    __slots__ = ("chunks", "size", "dropped", "_decoder")
+
+    def __init__(self):
+        self.chunks = deque()
+        self.size = 0
+        self.dropped = 0
+        self._decoder = codecs.getincrementaldecoder("utf-8")("replace")
+
+    @property
+    def total(self) -> int:
+        return self.dropped + self.size
+
+    def write(self, data: bytes, final: bool = False) -> str:
+        """Acrescenta bytes; retorna o texto novo (para publicar aos ouvintes)."""
+        text = self._decoder.decode(data, final)
+        if not text:
+            return text
+
+        self.chunks.append(text)
+        self.size += len(text)
+        while self.size > MAX_OUTPUT_CHARS:
+            excess = self.size - MAX_OUTPUT_CHARS
+            first = self.chunks[0]
+            if len(first) <= excess:
+                self.chunks.popleft()
+                cut = len(first)
+            else:
+                self.chunks[0] = first[excess:]
+                cut = excess
+            self.size -= cut
+            self.dropped += cut
+        return text
+
+    def value(self) -> str:
+        if len(self.chunks) > 1:
+            joined = "".join(self.chunks)
+            self.chunks.clear()
+            self.chunks.append(joined)
+        return self.chunks[0] if self.chunks else ""
+
+
+@dataclass(slots=True)
+class Job:
+    job_id: str
+    session_id: str
+    command: str
+    status: str = "running"
+    tail: OutputTail = field(default_factory=OutputTail)
+    error: Optional[str] = None
+    estimated_duration: int = 30
+    started_at: Optional[datetime] = None
+    completed_at: Optional[datetime] = None
+    return_code: Optional[int] = None
+    elapsed_seconds: Optional[float] = None
+    # Aviso ao cliente (ex: o shell da sessão foi recriado antes do comando)
+    notice: Optional[str] = None
+    # Relógio monotônico do início: elapsed sem reparsear/subtrair datetimes
+    _started_ts: float = field(default_factory=time.monotonic)
+
+    @property
+    def output(self) -> str:
+        return self.tail.value()
+
+    def finish(self, status: str, error: Optional[str], return_code: Optional[int] = None):
+        """
+        Passa o job para o estado final de uma vez só.
+
+        Não há `await` aqui dentro: como o servidor roda num único event loop,
+        nenhuma requisição enxerga o job pela metade (status novo com os
+        campos antigos) e os dicts de estado dispensam locks.
+        """
+        self.elapsed_seconds = time.monotonic() - self._started_ts
+        self.completed_at = datetime.now()
+        self.return_code = return_code
+        self.error = error
+        self.status = status
+
+
+class JobCache(LRUCache):
+    """LRU dos jobs; avisa se precisar descartar um job ainda em execução."""
+
+    def popitem(self):
+        job_id, job = super().popitem()
+        if job.status == "running":
+            # O comando continua rodando, mas o status deixa de ser consultável
+            print(f"⚠️ Evicted running job: {job.command[:50]} (job: {job_id[:8]}...)")
+        return job_id, job
+
+
+# Campos enviados na resposta: `output` entra no lugar do buffer `tail` e os
+# campos internos (prefixo `_`) ficam de fora
+_JOB_FIELDS = tuple(
+    f.name for f in fields(Job) if f.name != "tail" and not f.name.startswith("_")
+) + ("output",)
+# Omitidos da resposta enquanto forem None (os três primeiros só existem
+# depois que o job termina)
+_JOB_OPTIONAL = frozenset({"completed_at", "return_code", "elapsed_seconds", "notice"})
+
 # ============================================================================
 # ARMAZENAMENTO EM MEMÓRIA
 # ============================================================================
 
 
 sessions: Dict[str, dict] = {}
-jobs: Dict[str, dict] = {}
-command_history: Dict[str, list] = {}
+jobs: JobCache = JobCache(maxsize=JOBS_MAX)
+command_history: Dict[str, deque] = {}
+# Total de comandos já registrados por sessão (id dos eventos SSE; não
+# diminui quando o deque descarta os mais antigos)
+history_seq: Dict[str, int] = {}
+# Sinaliza o término de jobs em execução (para os canais WebSocket)
+job_events: Dict[str, asyncio.Event] = {}
+# Filas dos navegadores inscritos no stream SSE de cada sessão
+subscribers: Dict[str, List[asyncio.Queue]] = {}
+# Marca na fila de um navegador atrasado: o stream fecha e ele reconecta
+_LAGGING = (-1, None)
+# Referências aos jobs em execução (evita que o GC colete as tasks)
+_tasks: set = set()
+
+# ============================================================================
+# SHELL PERSISTENTE
+# ============================================================================
+
+
+class Shell:
+    """
+    Bash de longa duração de uma sessão: evita um fork+exec por comando e
+    mantém o estado do shell (cwd, variáveis) entre comandos.
+
+    Cada comando é lido por um heredoc e executado com `eval`, então um erro
+    de sintaxe não trava o shell; o fim do stdout e do stderr é marcado por um
+    sentinela aleatório seguido do exit code. Os comandos de uma sessão passam
+    todos por `lock`, em ordem de chegada.
+    """
+
+    __slots__ = ("proc", "lock", "marker", "started")
+
+    def __init__(self):
+        self.proc = None
+        self.lock = asyncio.Lock()
+        self.marker = f"__END_{uuid.uuid4().hex}__"
+        # Já houve um bash nesta sessão (para saber se o estado foi perdido)
+        self.started = False
+
+    def kill(self):
+        """Mata o bash e tudo que ele iniciou (grupo de processos próprio)."""
+        if self.proc is not None and self.proc.returncode is None:
+            try:
+                os.killpg(self.proc.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        self.proc = None
+
+    def lost_state(self) -> bool:
+        """
+        True se o bash anterior morreu (timeout, `exit`, sessão fechada): o
+        próximo comando começa num shell novo, no diretório do servidor.
+        """
+        return self.started and (self.proc is None or self.proc.returncode is not None)
+
+    async def run(self, command: str, timeout: float, on_stdout, on_stderr) -> int:
+        """
+        Executa um comando e retorna o exit code; a saída vai sendo entregue a
+        `on_stdout`/`on_stderr` (bytes) conforme chega.
+        """
+        if self.proc is None or self.proc.returncode is not None:
+            self.proc = await asyncio.create_subprocess_exec(
+                "bash", "--noprofile", "--norc",
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                start_new_session=True
+            )
+            self.started = True
+
+        # Referência local: kill() (close_session/shutdown) pode limpar
+        # self.proc enquanto o comando roda
+        proc = self.proc
+        m = self.marker
+        proc.stdin.write(
+            f"IFS= read -r -d '' __cmd <<'{m}'\n{command}\n{m}\n"
+            f"eval \"$__cmd\" < /dev/null\n"
+            f"__rc=$?; printf '\\n{m}%d\\n' \"$__rc\"; printf '\\n{m}\\n' >&2\n"
+            .encode()
+        )
+
+        try:
+            await proc.stdin.drain()
+            rc, _ = await asyncio.wait_for(
+                asyncio.gather(
+                    self._read(proc.stdout, on_stdout),
+                    self._read(proc.stderr, on_stderr)
+                ),
+                timeout=timeout
+            )
+        except asyncio.TimeoutError:
+            self.kill()
+            raise RuntimeError(f"Command timed out after {timeout:.0f}s")
+        except (BrokenPipeError, ConnectionResetError):
+            if self.proc is not proc:
+                raise RuntimeError("Session shell was killed (session closed)")
+            self.kill()
+            raise RuntimeError("Shell exited unexpectedly")
+
+        if rc is None:
+            if self.proc is not proc:
+                # kill() veio de fora enquanto o comando rodava
+                await proc.wait()
+                raise RuntimeError("Session shell was killed (session closed)")
+            # O comando encerrou o shell (ex: `exit 3`); recriado no próximo
+            rc = await proc.wait()
+            self.proc = None
+
+        return rc
+
+    async def _read(self, stream: asyncio.StreamReader, sink) -> Optional[int]:
+        """
+        Repassa o stream a `sink` até o sentinela; retorna o exit code escrito
+        depois dele (None se o shell fechou o stream antes).
+
+        Só os últimos len(sentinela) bytes ficam retidos, pois podem ser o
+        começo de um sentinela partido entre dois reads.
+        """
+        sentinel = b"\n" + self.marker.encode()
+        pending = bytearray()
+        while True:
+            chunk = await stream.read(65536)
+            if not chunk:
+                if pending:
+                    sink(bytes(pending))
+                return None
+            pending += chunk
+
+            idx = pending.find(sentinel)
+            if idx != -1:
+                end = pending.find(b"\n", idx + len(sentinel))
+                if end == -1:
+                    continue
+                if idx:
+                    sink(bytes(pending[:idx]))
+                code = pending[idx + len(sentinel):end]
+                return int(code) if code else 0
+
+            if len(pending) > len(sentinel):
+                cut = len(pending) - len(sentinel)
+                sink(bytes(pending[:cut]))
+                del pending[:cut]
+
 
 # ============================================================================
 # APLICAÇÃO FASTAPI
 # ============================================================================
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # Ao desligar: mata o shell de cada sessão (e o que ele iniciou)
+    for session in sessions.values():
+        session["shell"].kill()
+
+
 app = FastAPI(
     title="Secure Terminal Server",
     description="Servidor terminal seguro para Open WebUI",
-    version="1.1.0"
+    version="1.1.0",
+    lifespan=lifespan
 )
 
+
+class GZipExceptStreams(GZipMiddleware):
+    """GZip para tudo, menos o stream SSE (o compressor seguraria os eventos)."""
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"].startswith("/api/stream/"):
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
+
+
+class ImmutableStaticFiles(StaticFiles):
+    """Arquivos estáticos com cache longo: a URL muda quando o conteúdo muda."""
+
+    def file_response(self, *args, **kwargs):
+        response = super().file_response(*args, **kwargs)
+        response.headers["Cache-Control"] = "public, max-age=3600, immutable"
+        return response
+
+
+app.add_middleware(GZipExceptStreams, minimum_size=512)
+app.mount("/static", ImmutableStaticFiles(directory=STATIC_DIR), name="static")
+
 # ============================================================================
 # AUTENTICAÇÃO CORRIGIDA
 # ============================================================================
 
 
-def verify_api_key(authorization: str = Header(None)):
+# Faz o parse do header `Authorization: Bearer ...` (e documenta o esquema no
+# OpenAPI); auto_error=False para manter as respostas 401 abaixo
+bearer = HTTPBearer(auto_error=False)
+
+
+def verify_api_key(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(bearer)
+):
     """Verifica se a API key é válida."""
-    if not authorization:
+    if credentials is None:
         raise HTTPException(
-            status_code=401, detail="Authorization header missing")
+            status_code=401, detail="Bearer authorization missing")
 
-    if not authorization.startswith("Bearer "):
-        raise HTTPException(
-            status_code=401, detail="Invalid authorization format")
+    if not hmac.compare_digest(credentials.credentials.encode(), API_KEY_BYTES):
+        raise HTTPException(status_code=401, detail="Invalid API key")
 
-    token = authorization.replace("Bearer ", "")
+    return True
 
-    if token != API_KEY:
-        raise HTTPException(status_code=401, detail="Invalid API key")
+
+def ws_authorized(websocket: WebSocket) -> bool:
+    """Verifica a API key enviada no handshake de um WebSocket."""
+    authorization = websocket.headers.get("authorization", "")
+    return authorization.startswith("Bearer ") and hmac.compare_digest(
+        authorization[7:].encode(), API_KEY_BYTES)
+
+
+def json_response(content, headers: Optional[dict] = None) -> Response:
+    """Resposta JSON serializada direto pelo orjson (datetimes incluídos)."""
+    return Response(
+        content=orjson.dumps(content), media_type="application/json", headers=headers)
+
+
+def set_stream_cookie(response: Response, session_id: str):
+    """Entrega ao navegador o token assinado do stream desta sessão."""
+    response.set_cookie(
+        COOKIE_NAME,
+        _cookie_signer.dumps(session_id),
+        max_age=COOKIE_MAX_AGE,
+        path=f"/api/stream/{session_id}",
+        httponly=True,
+        samesite="strict"
+    )
+
+
+def verify_stream_token(
+    session_id: str,
+    term_tok: Optional[str] = Cookie(None),
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(bearer)
+):
+    """
+    Como verify_api_key, mas aceita o cookie da sessão (o EventSource do
+    navegador não envia headers e a página não tem mais a API key).
+    """
+    if term_tok is None:
+        return verify_api_key(credentials)
+
+    try:
+        signed_session = _cookie_signer.loads(term_tok, max_age=COOKIE_MAX_AGE)
+    except BadSignature:
+        raise HTTPException(status_code=401, detail="Invalid session token")
+
+    if signed_session != session_id:
+        raise HTTPException(status_code=401, detail="Invalid session token")
 
     return True
 
@@ -99,18 +491,26 @@ async def health_check():
 @app.post("/api/create_session")
 async def create_session(
     request: CreateSessionRequest,
+    response: Response,
     authenticated: bool = Depends(verify_api_key)
 ):
     """Cria uma nova sessão de terminal."""
     session_id = request.session_id
+    previous = sessions.get(session_id)
 
     sessions[session_id] = {
         "id": session_id,
         "created_at": datetime.now().isoformat(),
-        "active": True
+        "active": True,
+        # Recriar uma sessão existente reaproveita o shell dela
+        "shell": previous["shell"] if previous else Shell()
     }
 
-    command_history[session_id] = []
+    # setdefault: se a sessão já existia, histórico e ids SSE continuam valendo
+    command_history.setdefault(session_id, deque(maxlen=HIST_MAX))
+    history_seq.setdefault(session_id, 0)
+
+    set_stream_cookie(response, session_id)
 
     print(f"✅ Session created: {session_id}")
 
@@ -127,120 +527,392 @@ async def send_async_command(
     authenticated: bool = Depends(verify_api_key)
 ):
     """Envia comando para execução assíncrona."""
-    session_id = request.session_id
-    command = request.command
-
-    if session_id not in sessions:
+    if request.session_id not in sessions:
         raise HTTPException(status_code=404, detail="Session not found")
 
-    # Criar job
-    job_id = str(uuid.uuid4())
+    job_id = start_job(
+        request.session_id, request.command, request.estimated_duration)
 
-    jobs[job_id] = {
+    return {
+        "success": True,
         "job_id": job_id,
-        "session_id": session_id,
-        "command": command,
         "status": "running",
-        "output": "",
-        "error": None,
-        "started_at": datetime.now().isoformat()
+        "risk_level": "low"
     }
 
-    # Executar comando em background
-    asyncio.create_task(execute_command(job_id, command, session_id))
 
-    print(f"🚀 Command started: {command} (job: {job_id[:8]}...)")
+@app.post("/api/send_async_commands")
+async def send_async_commands(
+    request: SendCommandsRequest,
+    authenticated: bool = Depends(verify_api_key)
+):
+    """Envia vários comandos de uma vez (executados em ordem no shell da sessão)."""
+    if request.session_id not in sessions:
+        raise HTTPException(status_code=404, detail="Session not found")
+
+    job_ids = [
+        start_job(request.session_id, spec.command, spec.estimated_duration)
+        for spec in request.commands
+    ]
 
     return {
         "success": True,
-        "job_id": job_id,
+        "job_ids": job_ids,
         "status": "running",
         "risk_level": "low"
     }
 
 
-async def execute_command(job_id: str, command: str, session_id: str):
-    """Executa comando no terminal."""
-    try:
-        # Executar comando
-        process = await asyncio.create_subprocess_shell(
-            command,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
-        )
+def start_job(session_id: str, command: str, estimated_duration: int) -> str:
+    """Cria o job e dispara a execução em background. Retorna o job_id."""
+    job_id = uuid.uuid4().hex
 
-        stdout, stderr = await process.communicate()
+    job = jobs[job_id] = Job(
+        job_id=job_id,
+        session_id=session_id,
+        command=command,
+        estimated_duration=estimated_duration,
+        started_at=datetime.now()
+    )
+    job_events[job_id] = asyncio.Event()
+
+    # Executar comando em background
+    task = asyncio.create_task(execute_command(job))
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
 
-        output = stdout.decode() if stdout else ""
-        error = stderr.decode() if stderr else ""
+    print(f"🚀 Command started: {command} (job: {job_id[:8]}...)")
+
+    return job_id
 
-        # Calcular elapsed time
-        started = datetime.fromisoformat(jobs[job_id]["started_at"])
-        elapsed = (datetime.now() - started).total_seconds()
+
+def publish(session_id: str, seq: Optional[int], item: dict):
+    """
+    Entrega um evento aos streams SSE da sessão sem nunca bloquear.
+
+    Com a fila cheia, trechos de output (seq None) são descartados; um comando
+    do histórico esvazia a fila e deixa só a marca _LAGGING, para o navegador
+    reconectar e buscar o que perdeu pelo Last-Event-ID.
+    """
+    for queue in subscribers.get(session_id, ()):
+        try:
+            queue.put_nowait((seq, item))
+        except asyncio.QueueFull:
+            if seq is None:
+                continue
+            while not queue.empty():
+                queue.get_nowait()
+            queue.put_nowait(_LAGGING)
+
+
+async def execute_command(job: Job):
+    """
+    Executa o comando do job no terminal.
+
+    Recebe o próprio Job (e não o id): mesmo que o LRU o descarte antes de
+    começar, o comando roda e o resultado chega ao histórico e ao SSE.
+    """
+    job_id, command, session_id = job.job_id, job.command, job.session_id
+    err_tail = OutputTail()
+
+    def on_stdout(data: bytes):
+        # O output do job cresce ao vivo (polling/ETag veem o progresso) e
+        # cada trecho vai para os terminais abertos
+        text = job.tail.write(data)
+        if text and session_id in subscribers:
+            publish(session_id, None,
+                    {"job_id": job_id, "command": command, "text": text})
+
+    try:
+        shell = sessions[session_id]["shell"]
+
+        # Um comando por vez no shell da sessão, na ordem de envio: o estado
+        # (cwd, variáveis) de um passa para o seguinte
+        async with shell.lock:
+            if shell.lost_state():
+                job.notice = SHELL_RESET_NOTICE
+            returncode = await shell.run(
+                command, COMMAND_TIMEOUT, on_stdout, err_tail.write)
+
+        job.tail.write(b"", final=True)
+        err_tail.write(b"", final=True)
+        output = job.output
+        error = err_tail.value()
 
         # Atualizar job
-        jobs[job_id]["status"] = "completed" if process.returncode == 0 else "failed"
-        jobs[job_id]["output"] = output
-        jobs[job_id]["error"] = error if error else None
-        jobs[job_id]["return_code"] = process.returncode
-        jobs[job_id]["completed_at"] = datetime.now().isoformat()
-        jobs[job_id]["elapsed_seconds"] = elapsed
+        job.finish(
+            "completed" if returncode == 0 else "failed",
+            error if error else None,
+            returncode
+        )
 
         # Adicionar ao histórico
-        command_history[session_id].append({
+        item = {
+            "job_id": job_id,
             "command": command,
-            "output": output,
-            "error": error,
-            "return_code": process.returncode,
-            "timestamp": datetime.now().isoformat(),
+            "output": output[-HIST_OUTPUT_CHARS:],
+            "error": error[-HIST_OUTPUT_CHARS:],
+            "return_code": returncode,
+            "timestamp": datetime.now(),
             "source": "llm_async",
             "risk_level": "low"
-        })
+        }
+        command_history[session_id].append(item)
+        seq = history_seq[session_id] = history_seq.get(session_id, 0) + 1
+
+        # Avisar os terminais abertos
+        publish(session_id, seq, item)
 
         print(f"✅ Command completed: {command[:50]}... (job: {job_id[:8]}...)")
 
     except Exception as e:
-        jobs[job_id]["status"] = "failed"
-        jobs[job_id]["error"] = str(e)
-        jobs[job_id]["completed_at"] = datetime.now().isoformat()
+        job.finish("failed", str(e))
         print(f"❌ Command failed: {str(e)}")
 
+    finally:
+        event = job_events.pop(job_id, None)
+        if event:
+            event.set()
+
+
+def job_snapshot(record: Job, output: bool = True) -> dict:
+    """Cópia do job com elapsed_seconds calculado se ainda estiver rodando."""
+    job = {}
+    for name in _JOB_FIELDS:
+        value = getattr(record, name)
+        if value is not None or name not in _JOB_OPTIONAL:
+            job[name] = value
+
+    # Calcular elapsed time se ainda não tiver
+    if "elapsed_seconds" not in job and job["status"] == "running":
+        job["elapsed_seconds"] = time.monotonic() - record._started_ts
+        # Quanto falta pela estimativa do cliente (guia o backoff do polling)
+        job["estimated_remaining"] = max(
+            0.0, job["estimated_duration"] - job["elapsed_seconds"])
+
+    # Sem o output: o cliente busca só o trecho novo em /api/job/{id}/output
+    if not output:
+        job.pop("output")
+        job["output_length"] = record.tail.total
+
+    return job
+
+
+def job_etag(job: Job) -> str:
+    """ETag fraco do job: muda quando o status ou o tamanho do output mudam."""
+    return f'W/"{job.status}-{job.tail.total}"'
+
 
 @app.get("/api/job/{job_id}")
 async def get_job(
     job_id: str,
+    output: bool = True,
+    if_none_match: Optional[str] = Header(None),
     authenticated: bool = Depends(verify_api_key)
 ):
-    """Obtém status de um job."""
-    if job_id not in jobs:
+    """Obtém status de um job (304 se nada mudou desde o ETag informado)."""
+    job = jobs.get(job_id)
+    if job is None:
         raise HTTPException(status_code=404, detail="Job not found")
 
-    job = jobs[job_id].copy()
+    etag = job_etag(job)
+    if if_none_match == etag:
+        return Response(status_code=304, headers={"ETag": etag})
 
-    # Calcular elapsed time se ainda não tiver
-    if "elapsed_seconds" not in job and job["status"] == "running":
-        started = datetime.fromisoformat(job["started_at"])
-        job["elapsed_seconds"] = (datetime.now() - started).total_seconds()
+    # Resposta montada aqui: o orjson serializa os datetimes direto, sem
+    # passar pelo jsonable_encoder
+    return json_response(job_snapshot(job, output), headers={"ETag": etag})
 
-    return job
+
+@app.get("/api/job/{job_id}/output", response_class=PlainTextResponse)
+async def get_job_output(
+    job_id: str,
+    start: int = 0,
+    authenticated: bool = Depends(verify_api_key)
+):
+    """
+    Retorna o output do job a partir do caractere `start` (só o trecho novo).
+
+    `start` e `X-Output-Length` contam desde o início do output; se o começo
+    pedido já saiu do buffer, `X-Output-Start` indica de onde o trecho parte.
+    """
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    tail = job.tail
+    begin = max(start - tail.dropped, 0)
+    return PlainTextResponse(
+        tail.value()[begin:],
+        headers={
+            "X-Output-Length": str(tail.total),
+            "X-Output-Start": str(tail.dropped + begin)
+        }
+    )
+
+
+@app.post("/api/jobs/batch")
+async def get_jobs_batch(
+    request: JobsBatchRequest,
+    output: bool = True,
+    authenticated: bool = Depends(verify_api_key)
+):
+    """Obtém o status de vários jobs em uma única requisição."""
+    return json_response({
+        "jobs": {
+            job_id: job_snapshot(job, output)
+            for job_id in request.job_ids
+            if (job := jobs.get(job_id)) is not None
+        }
+    })
+
+
+@app.websocket("/api/ws/job/{job_id}")
+async def job_updates(websocket: WebSocket, job_id: str):
+    """Envia o estado atual do job e, quando ele terminar, o estado final."""
+    job = jobs.get(job_id)
+    if job is None or not ws_authorized(websocket):
+        await websocket.close(code=1008)
+        return
+
+    await websocket.accept()
+    try:
+        await websocket.send_text(orjson.dumps(job_snapshot(job)).decode())
+
+        event = job_events.get(job_id)
+        if event is not None:
+            # Espera o job terminar; frames do cliente são ignorados e só um
+            # websocket.disconnect encerra a espera antes da hora
+            done_wait = asyncio.create_task(event.wait())
+            try:
+                while True:
+                    received = asyncio.create_task(websocket.receive())
+                    done, _ = await asyncio.wait(
+                        {done_wait, received}, return_when=asyncio.FIRST_COMPLETED)
+                    if done_wait in done:
+                        received.cancel()
+                        break
+                    if received.result()["type"] == "websocket.disconnect":
+                        return
+            finally:
+                done_wait.cancel()
+            await websocket.send_text(orjson.dumps(job_snapshot(job)).decode())
+
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
+
+
+@app.get("/api/stream/{session_id}")
+async def stream_history(
+    session_id: str,
+    last_event_id: Optional[str] = Header(None),
+    authenticated: bool = Depends(verify_stream_token)
+):
+    """
+    Stream SSE do histórico: envia os comandos já executados e depois cada
+    comando novo assim que termina. Enquanto um comando roda, o output dele
+    chega em eventos `output`.
+
+    O id de cada evento é a posição do comando no histórico; ao reconectar, o
+    navegador manda `Last-Event-ID` e só recebe o que ainda não viu.
+    """
+    # O histórico é criado junto com a sessão
+    history = command_history.get(session_id)
+    if history is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+
+    seen = int(last_event_id) if last_event_id and last_event_id.isdigit() else 0
+
+    async def events():
+        queue: asyncio.Queue = asyncio.Queue(maxsize=SSE_QUEUE_MAX)
+        try:
+            # Inscreve antes de copiar o backlog para não perder um comando
+            # que termine entre as duas coisas
+            subscribers.setdefault(session_id, []).append(queue)
+            first = history_seq.get(session_id, 0) - len(history) + 1
+            skip = max(seen - first + 1, 0)
+            backlog = list(enumerate(islice(history, skip, None), first + skip))
+
+            for seq, item in backlog:
+                yield b"id: %d\ndata: %b\n\n" % (seq, orjson.dumps(item))
+            while True:
+                try:
+                    seq, item = await asyncio.wait_for(queue.get(), timeout=15)
+                except asyncio.TimeoutError:
+                    # Comentário SSE: mantém a conexão viva em proxies
+                    yield b": keepalive\n\n"
+                    continue
+                if seq == -1:
+                    # Navegador ficou para trás: fecha e ele reconecta
+                    return
+                if seq is None:
+                    # Trecho de output de um comando ainda em execução
+                    yield b"event: output\ndata: %b\n\n" % orjson.dumps(item)
+                else:
+                    yield b"id: %d\ndata: %b\n\n" % (seq, orjson.dumps(item))
+        finally:
+            queues = subscribers.get(session_id)
+            if queues is not None and queue in queues:
+                queues.remove(queue)
+                if not queues:
+                    del subscribers[session_id]
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache"}
+    )
 
 
 @app.get("/api/command_history/{session_id}")
 async def get_command_history(
     session_id: str,
+    limit: Optional[int] = Query(None, ge=0),
+    offset: int = Query(0, ge=0),
+    order: str = "asc",
+    if_none_match: Optional[str] = Header(None),
     authenticated: bool = Depends(verify_api_key)
 ):
-    """Obtém histórico de comandos de uma sessão."""
-    if session_id not in sessions:
-        raise HTTPException(status_code=404, detail="Session not found")
+    """
+    Obtém histórico de comandos de uma sessão.
 
-    history = command_history.get(session_id, [])
+    `limit` devolve só os N comandos mais recentes, pulando os `offset` mais
+    novos (paginação a partir do fim); `order=desc` põe os mais recentes
+    primeiro (ex: `?limit=1&order=desc` traz só o último comando). `total` é o
+    tamanho do histórico completo. Responde 304 se o histórico não mudou desde
+    o ETag informado.
+    """
+    # O histórico é criado junto com a sessão
+    history = command_history.get(session_id)
+    if history is None:
+        raise HTTPException(status_code=404, detail="Session not found")
 
-    return {
+    # O histórico só cresce: tamanho + último timestamp identificam a versão
+    etag = '"%s"' % hashlib.blake2b(
+        f"{len(history)}:{history[-1]['timestamp'] if history else ''}:{limit}:{offset}:{order}".encode(),
+        digest_size=8,
+    ).hexdigest()
+    if if_none_match == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+
+    total = len(history)
+    end = max(total - offset, 0)
+    start = 0 if limit is None else max(end - limit, 0)
+    history = list(islice(history, start, end))
+
+    if order == "desc":
+        history = history[::-1]
+    else:
+        order = "asc"
+
+    return json_response({
         "session_id": session_id,
         "history": history,
-        "count": len(history)
-    }
+        "count": len(history),
+        "total": total,
+        "order": order
+    }, headers={"ETag": etag})
 
 
 @app.post("/api/close_session/{session_id}")
@@ -249,11 +921,13 @@ async def close_session(
     authenticated: bool = Depends(verify_api_key)
 ):
     """Fecha uma sessão."""
-    if session_id not in sessions:
+    session = sessions.get(session_id)
+    if session is None:
         raise HTTPException(status_code=404, detail="Session not found")
 
-    sessions[session_id]["active"] = False
-    sessions[session_id]["closed_at"] = datetime.now().isoformat()
+    session["active"] = False
+    session["closed_at"] = datetime.now().isoformat()
+    session["shell"].kill()
 
     print(f"🔒 Session closed: {session_id}")
 
@@ -263,111 +937,83 @@ async def close_session(
     }
 
 
-@app.get("/terminal/{session_id}")
-async def terminal_page(session_id: str):
-    """Página do terminal (visualização web)."""
-    if session_id not in sessions:
-        return HTMLResponse(
-            content="<h1>Session not found</h1>",
-            status_code=404
-        )
+def _asset_version(name: str) -> str:
+    """Hash do conteúdo de um arquivo estático (cache-busting na URL)."""
+    with open(os.path.join(STATIC_DIR, name), "rb") as f:
+        return hashlib.blake2b(f.read(), digest_size=6).hexdigest()
+
 
-    html_content = f"""
+# Página do terminal: montada uma vez; por requisição só se trocam os
+# marcadores {SESSION_ID}, {SESSION_SHORT} e {CREATED_AT}. CSS e JS ficam em
+# static/, referenciados com a versão do conteúdo na URL
+_TERMINAL_TEMPLATE = """
     <!DOCTYPE html>
     <html>
     <head>
-        <title>Terminal - {session_id[:8]}</title>
-        <style>
-            body {{
-                background: #1e1e1e;
-                color: #d4d4d4;
-                font-family: 'Courier New', monospace;
-                padding: 20px;
-            }}
-            h1 {{
-                color: #4ec9b0;
-            }}
-            .session-info {{
-                background: #252526;
-                padding: 15px;
-                border-radius: 5px;
-                margin-bottom: 20px;
-            }}
-            .command-history {{
-                background: #1e1e1e;
-                border: 1px solid #3c3c3c;
-                padding: 15px;
-                border-radius: 5px;
-                max-height: 600px;
-                overflow-y: auto;
-            }}
-            .command {{
-                margin-bottom: 20px;
-                padding: 10px;
-                background: #252526;
-                border-left: 3px solid #4ec9b0;
-            }}
-            .command-text {{
-                color: #569cd6;
-                font-weight: bold;
-            }}
-            .output {{
-                color: #ce9178;
-                white-space: pre-wrap;
-                margin-top: 10px;
-            }}
-            .timestamp {{
-                color: #6a9955;
-                font-size: 0.9em;
-            }}
-        </style>
+        <title>Terminal - {SESSION_SHORT}</title>
+        <link rel="stylesheet" href="/static/terminal.css?v={CSS_VERSION}">
     </head>
-    <body>
+    <body data-session="{SESSION_ID}">
         <h1>🖥️ Secure Terminal Session</h1>
         <div class="session-info">
-            <strong>Session ID:</strong> {session_id}<br>
+            <strong>Session ID:</strong> {SESSION_ID}<br>
             <strong>Status:</strong> Active<br>
-            <strong>Created:</strong> {sessions[session_id]['created_at']}
+            <strong>Created:</strong> {CREATED_AT}
         </div>
         
         <h2>Command History</h2>
         <div class="command-history" id="history">
-            <p>No commands executed yet. Waiting for LLM to send commands...</p>
+            <p id="placeholder">No commands executed yet. Waiting for LLM to send commands...</p>
         </div>
         
-        <script>
-            // Auto-refresh history every 2 seconds
-            setInterval(async () => {{
-                try {{
-                    const response = await fetch('/api/command_history/{session_id}', {{
-                        headers: {{
-                            'Authorization': 'Bearer {API_KEY}'
-                        }}
-                    }});
-                    const data = await response.json();
-                    
-                    const historyDiv = document.getElementById('history');
-                    if (data.history.length === 0) {{
-                        historyDiv.innerHTML = '<p>No commands executed yet.</p>';
-                    }} else {{
-                        historyDiv.innerHTML = data.history.map(cmd => `
-                            <div class="command">
-                                <span class="timestamp">${{cmd.timestamp}}</span><br>
-                                <span class="command-text">$ ${{cmd.command}}</span>
-                                <div class="output">${{cmd.output || '(no output)'}}</div>
-                            </div>
-                        `).reverse().join('');
-                    }}
-                }} catch (e) {{
-                    console.error('Error fetching history:', e);
-                }}
-            }}, 2000);
-        </script>
+        <script src="/static/terminal.js?v={JS_VERSION}"></script>
     </body>
     </html>
+    """.replace("{CSS_VERSION}", _asset_version("terminal.css")).replace(
+    "{JS_VERSION}", _asset_version("terminal.js"))
+# Versão do template (entra no ETag da página)
+_TERMINAL_TEMPLATE_TAG = hashlib.blake2b(
+    _TERMINAL_TEMPLATE.encode(), digest_size=8).hexdigest()
+
+
+@app.get("/terminal/{session_id}")
+async def terminal_page(
+    session_id: str,
+    if_none_match: Optional[str] = Header(None)
+):
     """
+    Página do terminal (visualização web).
+
+    Não carrega segredos: o acesso ao stream vem do cookie assinado, renovado
+    a cada visita, e a página pode ficar no cache do navegador.
+    """
+    session = sessions.get(session_id)
+    if session is None:
+        return HTMLResponse(
+            content="<h1>Session not found</h1>",
+            status_code=404
+        )
+
+    created_at = session["created_at"]
+    etag = '"%s-%s"' % (_TERMINAL_TEMPLATE_TAG, hashlib.blake2b(
+        f"{session_id}:{created_at}".encode(), digest_size=8).hexdigest())
+    headers = {"ETag": etag, "Cache-Control": "private, max-age=60"}
+
+    if if_none_match == etag:
+        response = Response(status_code=304, headers=headers)
+        set_stream_cookie(response, session_id)
+        return response
+
+    html = (
+        _TERMINAL_TEMPLATE
+        .replace("{SESSION_SHORT}", session_id[:8])
+        .replace("{SESSION_ID}", session_id)
+        .replace("{CREATED_AT}", created_at)
+    )
 
-    return HTMLResponse(content=html_content)
+    response = HTMLResponse(content=html, headers=headers)
+    set_stream_cookie(response, session_id)
+    return response
 
 # ============================================================================
 # MAIN
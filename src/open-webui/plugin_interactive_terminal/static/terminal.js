@@ -0,0 +1,55 @@
+// Server-sent events: each finished command arrives once, with its
+// position in the history as the event id
+const historyDiv = document.getElementById('history');
+const source = new EventSource(
+    '/api/stream/' + encodeURIComponent(document.body.dataset.session));
+let seen = 0;
+
+const clearPlaceholder = () => {
+    const placeholder = document.getElementById('placeholder');
+    if (placeholder) placeholder.remove();
+};
+
+// Builds a history entry with textContent only: commands and their output
+// are never parsed as HTML
+const commandEntry = (timestamp, command, output) => {
+    const entry = document.createElement('div');
+    entry.className = 'command';
+    const time = document.createElement('span');
+    time.className = 'timestamp';
+    time.textContent = timestamp;
+    const text = document.createElement('span');
+    text.className = 'command-text';
+    text.textContent = '$ ' + command;
+    const out = document.createElement('div');
+    out.className = 'output';
+    out.textContent = output;
+    entry.append(time, document.createElement('br'), text, out);
+    historyDiv.prepend(entry);
+    return entry;
+};
+
+source.onmessage = (event) => {
+    const id = Number(event.lastEventId);
+    if (id <= seen) return;
+    clearPlaceholder();
+    seen = id;
+
+    const cmd = JSON.parse(event.data);
+    const live = document.getElementById('live-' + cmd.job_id);
+    if (live) live.remove();
+    commandEntry(cmd.timestamp, cmd.command, cmd.output || '(no output)');
+};
+
+// Partial output of a running command
+source.addEventListener('output', (event) => {
+    const chunk = JSON.parse(event.data);
+    let live = document.getElementById('live-' + chunk.job_id);
+    if (!live) {
+        clearPlaceholder();
+        live = commandEntry('running...', chunk.command, '');
+        live.id = 'live-' + chunk.job_id;
+    }
+    live.lastElementChild.append(chunk.text);
+});
+source.onerror = (e) => console.error('History stream error:', e);